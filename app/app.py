@@ -8,6 +8,7 @@ from . import views
 from . import callbacks
 from . import components
 from .data.database import get_unfiltered_df
+from .data.db_helper import pool
 from .styles.lpmtg_style import lpmtg_template
 
 logger = logging.getLogger(__name__)
@@ -40,7 +41,7 @@ def generate_layout():
                 ],
                 className="row"
             ),
-            html.Div(id="hidden-div", style={"display": "none"})
+            html.Div(id="hidden-div", style={"display": "none"}),
         ],
         className="container-fluid",
         id="base-layout"
@@ -58,6 +59,14 @@ def generate_layout():
     )
 
 
+@server.route("/health")
+def health():
+    # For the container and load balancer checks, the page itself would load the whole dataset
+    if pool.healthcheck():
+        return {"status": "ok"}, 200
+    return {"status": "database unreachable"}, 503
+
+
 app.config.suppress_callback_exceptions=True
 app.layout = generate_layout
 
@@ -1,3 +1,5 @@
+from ..data import clientside
+
 # site callbacks
 from . import pagecallbacks
 from . import tabscallback
@@ -5,11 +7,18 @@ from . import tabscallback
 # plot callbacks
 from . import histbymagrange
 from . import histovertimemagmean
-from . import linedailyearthquakes
-from . import scatterbydepth
 from . import scatterplotmap
 from . import heatmap
 from . import scatterplotxyz
 from . import treemapearthquakes
 from . import cumenergy
-#from . import statistictables   # TODO:
\ No newline at end of file
+
+# graphs filtered in the browser in client side mode
+if clientside.ENABLED:
+    from . import clientsidefiltering
+else:
+    from . import linedailyearthquakes
+    from . import scatterbydepth
+
+# statistics tables paging
+from . import statistictables
@@ -0,0 +1,60 @@
+import logging
+
+from dash.dependencies import ClientsideFunction, Input, Output
+
+from ..data import database, clientside, lru
+
+# load app
+from ..server import app
+
+
+logger = logging.getLogger(__name__)
+
+# Payloads of the recently selected date ranges, per dataset version
+_payloads = lru.LRUCache(16)
+
+
+# Only the dates go to the server, the sliders are applied in the browser (assets/clientside.js)
+@app.callback(
+    Output("events-store", "data"),
+    [
+        Input('date-picker', 'start_date'),
+        Input('date-picker', 'end_date'),
+    ]
+)
+def events_store(start_date, end_date):
+    df = database.get_master_df(start_date, end_date)
+
+    key = (database.dataset_version(df), *database.filter_key(start_date, end_date))
+    payload = _payloads.get(key)
+    if payload is None:
+        payload = {
+            "columns": clientside.event_columns(df),
+            "layouts": clientside.get_layouts(),
+            "webgl_threshold": clientside.WEBGL_THRESHOLD,
+        }
+        if key[0] is not None:
+            _payloads.set(key, payload)
+
+    return payload
+
+
+app.clientside_callback(
+    ClientsideFunction(namespace="events", function_name="scatter_depth"),
+    Output("scatter-depth", "figure"),
+    [
+        Input("events-store", "data"),
+        Input('magnitude-slider', 'value'),
+        Input("depth-slider", "value")
+    ]
+)
+
+app.clientside_callback(
+    ClientsideFunction(namespace="events", function_name="line_daily"),
+    Output("line-daily-earthquakes", "figure"),
+    [
+        Input("events-store", "data"),
+        Input('magnitude-slider', 'value'),
+        Input("depth-slider", "value")
+    ]
+)
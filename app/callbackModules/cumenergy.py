@@ -1,21 +1,78 @@
 import logging
+import os
 
 import dash_bootstrap_components as dbc
-from dash import html
+from dash import html, callback_context
 from dash.dependencies import Input, Output
 import plotly.express as px
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
+import numpy as np
 import pandas as pd
 
-from ..data import database, calculations
+from ..data import database, calculations, figure_cache
 
 # load app
 from ..server import app
+from ..styles.webgl import render_mode
 
 
 logger = logging.getLogger(__name__)
 
+# Points of the cumulative energy line sent for the visible time window, more than enough for
+# the width of a screen
+LINE_MAX_POINTS = int(os.environ.get("CUMENERGY_MAX_POINTS", 2000))
+
+
+def _x_range(relayout_data):
+    """Get the zoomed time window from the graph relayoutData
+
+    Returns:
+        tuple(pd.Timestamp, pd.Timestamp): start and end, None when not zoomed on the time axis
+    """
+    if not relayout_data or relayout_data.get("xaxis.autorange"):
+        return None
+
+    if "xaxis.range[0]" in relayout_data and "xaxis.range[1]" in relayout_data:
+        x_range = relayout_data["xaxis.range[0]"], relayout_data["xaxis.range[1]"]
+    elif "xaxis.range" in relayout_data:
+        x_range = relayout_data["xaxis.range"]
+    else:
+        return None
+
+    try:
+        return pd.Timestamp(x_range[0]), pd.Timestamp(x_range[1])
+    except ValueError:
+        return None
+
+
+def _zoom_window(relayout_data, start_date, end_date):
+    """Get the zoomed time window that still applies to the selected dates
+
+    relayoutData is kept by the graph when the dates change, a zoom only counts when it's what
+    triggered the callback or when it still overlaps the selected dates (clamped to them).
+
+    Returns:
+        tuple(str, str): iso start and end of the window, None to show the whole selection
+    """
+    x_range = _x_range(relayout_data)
+    if x_range is None:
+        return None
+
+    triggered = {t["prop_id"] for t in callback_context.triggered}
+    if "line-cumenergy.relayoutData" not in triggered:
+        # New dates reset the zoom (see uirevision)
+        if {"date-picker.start_date", "date-picker.end_date"} & triggered:
+            return None
+
+        start = x_range[0] if start_date is None else max(x_range[0], pd.Timestamp(start_date).normalize())
+        end = x_range[1] if end_date is None else min(x_range[1], pd.Timestamp(end_date).normalize() + pd.Timedelta(days=1))
+        if start >= end:
+            return None
+        x_range = start, end
+
+    return x_range[0].isoformat(), x_range[1].isoformat()
+
 
 # cumulative energy plot with earthquakes plotted on it on a secondary axis
 @app.callback(
@@ -24,28 +81,45 @@ logger = logging.getLogger(__name__)
         Input('date-picker', 'start_date'),
         Input('date-picker', 'end_date'),
         Input('magnitude-slider', 'value'),
-        Input("depth-slider", "value")
+        Input("depth-slider", "value"),
+        Input("line-cumenergy", "relayoutData"),
     ]
 )
-def energy_plot(start_date, end_date, magnitude_range, depth_range):
+def energy_plot(start_date, end_date, magnitude_range, depth_range, relayout_data):
+    return energy_figure(start_date, end_date, magnitude_range, depth_range, _zoom_window(relayout_data, start_date, end_date))
 
-    df = database.get_unfiltered_df()
-    date_mask, mag_mask, depth_mask = calculations.filter_data(df, start_date, end_date, magnitude_range, depth_range)
 
-    df = df[date_mask & mag_mask & depth_mask]
+@figure_cache.cached_figure
+def energy_figure(start_date, end_date, magnitude_range, depth_range, zoom_window):
+
+    df = database.get_master_df(start_date, end_date, magnitude_range, depth_range)
+
+    # Only the zoomed window is sent, with the events just outside of it so the line reaches the edges
+    x_range = None if zoom_window is None else (pd.Timestamp(zoom_window[0]), pd.Timestamp(zoom_window[1]))
+    if x_range is not None and len(df):
+        times = df["time"].to_numpy()
+        start = max(np.searchsorted(times, x_range[0].to_datetime64(), side="left") - 1, 0)
+        end = np.searchsorted(times, x_range[1].to_datetime64(), side="right") + 1
+        df = df.iloc[start:end]
+
+    # Energy of the events matching the filters since the start of the dataset. The line is
+    # downsampled to what the screen can show, the magnitudes are all kept.
+    line_df = df[["time"]].assign(cumEnergy=database.get_cumulative_energy(df, magnitude_range, depth_range))
+    line_df = line_df.iloc[calculations.lttb(line_df["time"].to_numpy(), line_df["cumEnergy"].to_numpy(), LINE_MAX_POINTS)]
 
     # To prevent exceptions, return empty figure if there are no values
     try:
         fig = make_subplots(specs=[[{"secondary_y": True}]])
 
         subfig1 = px.line(
-            df,
+            line_df,
             x="time",
             y="cumEnergy",
             labels={
                 "cumEnergy": "Energy"
             },
             color_discrete_sequence=["green"],
+            render_mode=render_mode(line_df),
         )
 
         subfig1.update_traces(
@@ -59,6 +133,7 @@ def energy_plot(start_date, end_date, magnitude_range, depth_range):
             size="mag",
             color="mag",
             hover_data=["mag"],
+            render_mode=render_mode(df),
         )
 
         subfig2.update_traces(yaxis="y2")
@@ -69,7 +144,12 @@ def energy_plot(start_date, end_date, magnitude_range, depth_range):
         fig.layout.yaxis2.title = "Magnitude"
         fig.layout.title = "Cumulative energy"
 
-        fig.update_xaxes(range=[df.time.min() - pd.Timedelta(hours=1), df.time.max() + pd.Timedelta(hours=1)])
+        if x_range is None:
+            fig.update_xaxes(range=[df.time.min() - pd.Timedelta(hours=1), df.time.max() + pd.Timedelta(hours=1)])
+        else:
+            fig.update_xaxes(range=list(x_range))
+        # Keeps the zoom when the figure is rebuilt for the new window
+        fig.update_layout(uirevision=f"{start_date}{end_date}")
     except Exception as e:
         logger.error(f"Failed to load figure: {e}")
         fig = go.Figure()
@@ -3,7 +3,7 @@ import logging
 from dash.dependencies import Input, Output
 import plotly.graph_objects as go
 
-from ..data import database, calculations
+from ..data import database, figure_cache, spatial
 
 # load app
 from ..server import app
@@ -20,26 +20,26 @@ logger = logging.getLogger(__name__)
         Input("depth-slider", "value")
     ]
 )
+@figure_cache.cached_figure
 def heatmap_eq(start_date, end_date, magnitude_range, depth_range):
-    df = database.get_unfiltered_df()
-    date_mask, mag_mask, depth_mask = calculations.filter_data(df, start_date, end_date, magnitude_range, depth_range)
-
-    df = df[date_mask & mag_mask & depth_mask]
+    df = database.get_master_df(start_date, end_date, magnitude_range, depth_range)
 
     # To prevent exceptions, return empty figure if there are no values
     try:
 
+        # One point per grid cell sized for the initial zoom instead of one per event
+        grid = spatial.aggregate_grid(df, spatial.cell_size(spatial.DEFAULT_ZOOM))
         fig = go.Figure(go.Densitymapbox(
-            lat=df.lat,
-            lon=df.lon,
-            z=df.mag,
-            radius=df["mag"] ** 2,
+            lat=grid.lat,
+            lon=grid.lon,
+            z=grid.mag,
+            radius=grid.mag_sq,
         ))
         fig.update_layout(
             mapbox_style="open-street-map",
             mapbox_center_lon=-17.8470,
             mapbox_center_lat=28.6716,
-            mapbox_zoom=8
+            mapbox_zoom=spatial.DEFAULT_ZOOM
         )
         fig.update_layout(
             margin={"r": 0, "t": 0, "l": 0, "b": 0},
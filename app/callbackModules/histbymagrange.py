@@ -7,7 +7,7 @@ import plotly.express as px
 import plotly.graph_objects as go
 import pandas as pd
 
-from ..data import database, calculations
+from ..data import database, calculations, figure_cache
 
 # load app
 from ..server import app
@@ -26,26 +26,28 @@ logger = logging.getLogger(__name__)
         Input("depth-slider", "value")
     ]
 )
+@figure_cache.cached_figure
 def eq_hist_by_magnitude_range(start_date, end_date, magnitude_range, depth_range):
-    df = database.get_unfiltered_df()
-    date_mask, mag_mask, depth_mask = calculations.filter_data(df, start_date, end_date, magnitude_range, depth_range)
-    n_bins = calculations.get_n_bins(df, ["date", "mag_range"])
+    df = database.get_master_df(start_date, end_date, magnitude_range, depth_range)
 
-    df = df[date_mask & mag_mask & depth_mask]
+    # Bins are counted here, the figure only carries one bar per day and magnitude range
+    counts = calculations.get_daily_counts(df, "mag_range").sort_values("mag_range", kind="stable")
+    # px would rebuild an IntervalIndex from the categories, which prints the edges as floats
+    counts["mag_range"] = counts["mag_range"].astype(str)
 
-    n = len(df.groupby("mag_range").count())
+    n = counts["mag_range"].nunique()
     custom_gradient = custom_discrete_sequence(n)[::-1]
 
     # To prevent exceptions, return empty figure if there are no values
     try:
-        fig = px.histogram(
-            df.sort_values("mag_range"),
+        fig = px.bar(
+            counts,
             x="date",
+            y="count",
             color="mag_range",
             barmode="group",
             color_discrete_sequence=custom_gradient,
             title="Earthquake over time sorted by Magnitude range",
-            nbins=n_bins,
         )
     except Exception as e:
         logger.error(f"Failed to load figure: {e}")
@@ -7,7 +7,7 @@ import plotly.express as px
 import plotly.graph_objects as go
 import pandas as pd
 
-from ..data import database, calculations
+from ..data import database, calculations, figure_cache
 
 # load app
 from ..server import app
@@ -25,29 +25,32 @@ logger = logging.getLogger(__name__)
         Input("depth-slider", "value")
     ]
 )
+@figure_cache.cached_figure
 def hist_eq_over_time_mag_mean(start_date, end_date, magnitude_range, depth_range):
-    df = database.get_unfiltered_df()
-    date_mask, mag_mask, depth_mask = calculations.filter_data(df, start_date, end_date, magnitude_range, depth_range)
+    df = database.get_master_df(start_date, end_date, magnitude_range, depth_range)
 
-    n_bins = calculations.get_n_bins(df, ["date"]) + 10
+    # Bins are counted here, the figure only carries one bar per day. mag_mean is a label,
+    # as a string px keeps one discrete color per value like the histogram did.
+    counts = calculations.get_daily_counts(df, "mag_mean").sort_values("mag_mean", ascending=False, kind="stable")
+    counts["mag_mean"] = counts["mag_mean"].astype(str)
 
-    df = df[date_mask & mag_mask & depth_mask]
-
-    n = len(df.groupby("mag_mean").count())
+    n = counts["mag_mean"].nunique()
     custom_gradient = custom_discrete_sequence(n)
 
     # To prevent exceptions, return empty figure if there are no values
     try:
-        fig = px.histogram(
-            df.sort_values("mag_mean", ascending=False),
+        fig = px.bar(
+            counts,
             x="date",
+            y="count",
             color="mag_mean",
             color_discrete_sequence=custom_gradient,
-            nbins=n_bins,
             title="Daily earthquake colored by daily mean magnitude.",
         )
 
-        fig.add_trace(go.Scatter(x=df["date"], y=df["daily_energy"], mode="lines+markers", yaxis="y2", line=dict(color='royalblue', width=4)))
+        # One point per day, summed over the filtered events only
+        daily_energy = df.groupby("date", sort=True)["energy"].sum()
+        fig.add_trace(go.Scatter(x=daily_energy.index, y=daily_energy.to_numpy(), mode="lines+markers", yaxis="y2", line=dict(color='royalblue', width=4)))
 
         fig.update_layout(
             bargap=0.01,
@@ -7,7 +7,7 @@ import plotly.express as px
 import plotly.graph_objects as go
 import pandas as pd
 
-from ..data import database, calculations
+from ..data import database, figure_cache
 
 # load app
 from ..server import app
@@ -25,11 +25,9 @@ logger = logging.getLogger(__name__)
         Input("depth-slider", "value")
     ]
 )
+@figure_cache.cached_figure
 def line_daily_eq(start_date, end_date, magnitude_range, depth_range):
-    df = database.get_unfiltered_df()
-    date_mask, mag_mask, depth_mask = calculations.filter_data(df, start_date, end_date, magnitude_range, depth_range)
-
-    df = df[date_mask & mag_mask & depth_mask]
+    df = database.get_master_df(start_date, end_date, magnitude_range, depth_range)
     df = database.get_stats_df("date", df)
 
     # To prevent exceptions, return empty figure if there are no values
@@ -7,10 +7,11 @@ import plotly.express as px
 import plotly.graph_objects as go
 import pandas as pd
 
-from ..data import database, calculations
+from ..data import database, figure_cache
 
 # load app
 from ..server import app
+from ..styles.webgl import render_mode
 
 logger = logging.getLogger(__name__)
 
@@ -24,11 +25,9 @@ logger = logging.getLogger(__name__)
         Input("depth-slider", "value")
     ]
 )
+@figure_cache.cached_figure
 def scatter_eq_by_depth(start_date, end_date, magnitude_range, depth_range):
-    df = database.get_unfiltered_df()
-    date_mask, mag_mask, depth_mask = calculations.filter_data(df, start_date, end_date, magnitude_range, depth_range)
-
-    df = df[date_mask & mag_mask & depth_mask]
+    df = database.get_master_df(start_date, end_date, magnitude_range, depth_range)
 
     # To prevent exceptions, return empty figure if there are no values
     try:
@@ -41,6 +40,7 @@ def scatter_eq_by_depth(start_date, end_date, magnitude_range, depth_range):
             size_max=15,
             color_discrete_sequence=px.colors.cyclical.IceFire,
             title="Earthquakes over time by depth (colored by magnitude)",
+            render_mode=render_mode(df),
         )
     except Exception as e:
         logger.error(f"Failed to load figure: {e}")
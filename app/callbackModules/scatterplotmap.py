@@ -1,9 +1,11 @@
 import logging
 
-from dash.dependencies import Input, Output
+from dash.dependencies import Input, Output, State
+from dash.exceptions import PreventUpdate
+import numpy as np
 import plotly.graph_objects as go
 
-from ..data import database, calculations, copernicus_data
+from ..data import database, copernicus_data, figure_cache, spatial
 
 # load app
 from ..server import app
@@ -11,6 +13,19 @@ from ..server import app
 logger = logging.getLogger(__name__)
 
 
+# Only zoom level changes and pans past the loaded tiles reach map_eq
+@app.callback(
+    Output("map-viewport", "data"),
+    Input("map-viz", "relayoutData"),
+    State("map-viewport", "data"),
+)
+def map_viewport(relayout_data, current_viewport):
+    viewport = spatial.viewport(relayout_data, current_viewport)
+    if viewport is None:
+        raise PreventUpdate
+    return viewport
+
+
 @app.callback(
     Output("map-viz", "figure"),
     [
@@ -21,13 +36,14 @@ logger = logging.getLogger(__name__)
         Input("map-style", "value"),
         Input("map-overlay", "value"),
         Input("map-type", "value"),
+        Input("map-viewport", "data"),
     ]
 )
-def map_eq(start_date, end_date, magnitude_range, depth_range, map_style, map_overlay, map_type):
-    df = database.get_unfiltered_df()
-    date_mask, mag_mask, depth_mask = calculations.filter_data(df, start_date, end_date, magnitude_range, depth_range)
+@figure_cache.cached_figure
+def map_eq(start_date, end_date, magnitude_range, depth_range, map_style, map_overlay, map_type, viewport):
+    viewport = viewport or {"zoom": spatial.DEFAULT_ZOOM, "bounds": None}
 
-    df = df[date_mask & mag_mask & depth_mask]
+    df = database.get_master_df(start_date, end_date, magnitude_range, depth_range)
 
     ovr = {}
     if map_overlay:
@@ -51,22 +67,33 @@ def map_eq(start_date, end_date, magnitude_range, depth_range, map_style, map_ov
     # To prevent exceptions, return empty figure if there are no values
     try:
         if map_type == "scatter":
+            # Close events share a marker, only the markers of the visible tiles are sent
+            clusters = database.get_cluster_index(start_date, end_date, magnitude_range, depth_range).query(**viewport)
+            single = (clusters["count"] == 1).to_numpy()
+            count = clusters["count"].to_numpy()
             fig = go.Figure(go.Scattermapbox(
-                lat=df.lat,
-                lon=df.lon,
+                lat=clusters.lat,
+                lon=clusters.lon,
                 mode="markers",
                 marker={
-                    "size": df["mag"] * 2 ** 2,
-                    "color": df.mag,
+                    "size": np.where(single, clusters["mag_max"] * 2 ** 2, 12 + 4 * np.log2(count)),
+                    "color": clusters.mag_max,
                     "showscale": True,
                 },
+                hovertext=np.where(
+                    single,
+                    "Magnitude " + clusters["mag_max"].astype(str),
+                    clusters["count"].astype(str) + " earthquakes, up to magnitude " + clusters["mag_max"].astype(str),
+                ),
             ))
-        elif map_type == "heatmap":
+        elif map_type in ("heatmap", "energy-heatmap"):
+            # One point per grid cell sized for the zoom level instead of one per event
+            grid = spatial.aggregate_grid(df, spatial.cell_size(viewport["zoom"]))
             fig = go.Figure(go.Densitymapbox(
-                lat=df.lat,
-                lon=df.lon,
-                z=df.mag,
-                radius=df["mag"] ** 2,
+                lat=grid.lat,
+                lon=grid.lon,
+                z=grid.mag if map_type == "heatmap" else np.log10(grid.energy),
+                radius=grid.mag_sq,
             ))
         else:
             raise Exception("map type unknown")
@@ -78,7 +105,7 @@ def map_eq(start_date, end_date, magnitude_range, depth_range, map_style, map_ov
             showlegend=False,
             mapbox_center_lon=-17.8470,
             mapbox_center_lat=28.6716,
-            mapbox_zoom=8,
+            mapbox_zoom=spatial.DEFAULT_ZOOM,
             mapbox_layers=[ovr]
         )
 
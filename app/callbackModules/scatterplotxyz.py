@@ -1,16 +1,13 @@
-import os
 import logging
 
-from skimage import io
 import dash_bootstrap_components as dbc
 from dash import html
 from dash.dependencies import Input, Output
 import plotly.express as px
 import plotly.graph_objects as go
 import pandas as pd
-import numpy as np
 
-from ..data import database, calculations
+from ..data import database, basemap, figure_cache
 
 # load app
 from ..server import app
@@ -27,44 +24,13 @@ logger = logging.getLogger(__name__)
         Input("depth-slider", "value")
     ]
 )
+@figure_cache.cached_figure
 def scatter_3d_eq_coord_by_depth(start_date, end_date, magnitude_range, depth_range):
-    df = database.get_unfiltered_df()
-    date_mask, mag_mask, depth_mask = calculations.filter_data(df, start_date, end_date, magnitude_range, depth_range)
-
-    df = df[date_mask & mag_mask & depth_mask]
-    # get image file location
-    root_dir = os.path.dirname(os.path.abspath(__file__))
-    root_dir = root_dir.split('\\')[:-1]
-    newPath = ""
-    for directory in root_dir:
-        newPath = os.path.join(newPath, directory)
-    img_file = os.path.join(newPath, 'app', 'assets', 'map.png')
-
-    # coordinates of the map, changing this will fuck up the scaling, need a new map if you want to change this
-    lat_min = 28.4007
-    lat_max = 28.7105
-
-    lon_min =-17.9915
-    lon_max =-17.6973
+    df = database.get_master_df(start_date, end_date, magnitude_range, depth_range)
 
     # apart from the masks, filter all the datapoints outside of the map to prevent scaling issues or the map not covering the entire plot
-    df = df[
-        (df.lat <= lat_max) &
-        (df.lat >= lat_min) &
-        (df.lon <= lon_max) &
-        (df.lon >= lon_min)
-    ]
-
-    # get image size
-    img = io.imread(img_file)
-    volume = img.T
-    r, c = volume[0].shape
-
-    #scale lat and lon to row and column size of image, in seperate cols so the real lat and lon is still available while hovering
-    # Issue: Map is off coordinates by  only a tiny bit. Shifting entire plot slightly.
-    # Do note: Only changes physical location on map, it doesn't change the actual coordinates.
-    df['lat_scaled'] = calculations.scaling(df.lat-0.025, lat_min, lat_max, c)
-    df['lon_scaled'] = calculations.scaling(df.lon+0.025, lon_min, lon_max, r)
+    # lat_scaled and lon_scaled are the coordinates on the map, the real lat and lon are still available while hovering
+    df = df[basemap.on_map(df)]
 
     # To prevent exceptions, return empty figure if there are no values
     try:
@@ -81,15 +47,7 @@ def scatter_3d_eq_coord_by_depth(start_date, end_date, magnitude_range, depth_ra
                             title="Earthquake 3d depth map")
 
         # add grayscale image to plot (impossible have an image with color :( )
-        fig.add_trace(go.Surface(
-            z=0 * np.ones((r, c)),
-            surfacecolor=volume[0],
-            colorscale='Gray',
-            showscale=False,
-            opacity=0.5,
-            cmin=0, cmax=255,
-            hoverinfo='skip'    # hoverinfo is turned off, but trace is still a plane. Can't get the data underneath it sadly
-            ))
+        fig.add_trace(basemap.get_surface())
 
         # only show height, because lat and lon are no longer useful. Hoverdata displays real lat/lon, not scaled
         fig.update_layout(
@@ -1,30 +1,92 @@
 from datetime import datetime as dt
 
+import pandas as pd
 from dash import dash_table
+from dash.dependencies import Input, Output
 
-from ..data import database
+from ..data import database, calculations, lru
 from ..styles import table_styling
 
+# load app
+from ..server import app
 
-def stat_table_day():
-    df = database.get_stats_df("date").sort_values("date", ascending=False)
 
-    # TODO: Work this into a a component so it can be used by all the table stats
-    # and add a callback with the tabs? Not sure though
+# Rows sent to the browser per page, the tables are sorted and sliced on the server
+PAGE_SIZE = 25
+
+# Today's earthquakes per dataset version and day
+_today = lru.LRUCache(4)
+
+
+def get_today_df():
+    """get the earthquakes of the current (UTC) day, newest first
+
+    Returns:
+        pd dataframe: time, mag, depth, energy and formatted coordinate of today's earthquakes
+    """
+    master_df = database.get_unfiltered_df()
+    today = pd.Timestamp(dt.utcnow().date())
+
+    key = (database.dataset_version(master_df), today)
+    df = _today.get(key)
+    if df is None:
+        df = master_df[master_df["date"] == today][["time", "mag", "depth", "lat", "lon", "energy"]]
+        df = df.assign(coordinate=calculations.format_coordinates(df)).drop(columns=["lat", "lon"])
+        df = df.sort_values("time", ascending=False)
+        if key[0] is not None:
+            _today.set(key, df)
+
+    return df
+
+
+def get_page(df, page_current, page_size, sort_by, default_sort):
+    """Sort a table and slice out the page shown by the DataTable
+
+    Args:
+        df (pd dataframe): whole table
+        page_current (int): page index, starting at 0
+        page_size (int): rows per page
+        sort_by (list[dict]): DataTable sort_by property ({"column_id": ..., "direction": "asc"/"desc"})
+        default_sort (list[dict]): order to use when sort_by is empty
+
+    Returns:
+        pd dataframe: rows of the page
+    """
+    sort_by = [s for s in (sort_by or default_sort) if s["column_id"] in df]
+    if sort_by:
+        df = df.sort_values(
+            [s["column_id"] for s in sort_by],
+            ascending=[s["direction"] == "asc" for s in sort_by],
+            kind="mergesort",
+        )
+
+    start = (page_current or 0) * page_size
+    return df.iloc[start:start + page_size]
+
+
+def page_count(df, page_size=PAGE_SIZE):
+    return max(1, -(-len(df) // page_size))
+
+
+def _styles_key(*key):
+    # The aggregates only change with the dataset, so do their conditional styles
+    version = database.current_version()
+    return None if version is None else (version, *key)
+
+
+def _paged_table(table_id, columns, df, default_sort, styles_key=None):
+    # Only the styles are computed from the whole table, the rows come from the page callbacks
     return dash_table.DataTable(
-        columns=[
-            dict(id='date', name='Date', type='datetime'),
-            dict(id='earthquakes', name='Earthquakes count', type='numeric'),
-            table_styling.ColumnFormat("depth_min", "Minimum Depth").depth(),
-            table_styling.ColumnFormat("depth_max", "Maximum Depth").depth(),
-            table_styling.ColumnFormat("depth_mean", "Mean Depth").depth(),
-            table_styling.ColumnFormat("mag_min", "Minimum Magnitude").magnitude(),
-            table_styling.ColumnFormat("mag_max", "Maximum Magnitude").magnitude(),
-            table_styling.ColumnFormat("mag_mean", "Mean Magnitude").magnitude(),
-            table_styling.ColumnFormat("energy", "Energy release (in joules)").energy(),
-        ],
-        data=df.to_dict('records'),
-        sort_action="native",
+        id=table_id,
+        columns=columns,
+        data=[],
+        page_action="custom",
+        page_current=0,
+        page_size=PAGE_SIZE,
+        page_count=page_count(df),
+        sort_action="custom",
+        sort_mode="single",
+        sort_by=default_sort,
         style_cell=dict(textAlign='left'),
         style_header=dict(
             backgroundColor='rgb(30,30,30)',
@@ -36,7 +98,7 @@ def stat_table_day():
             ),
         style_data_conditional=[
             table_styling.every_other_rows(df),
-            *table_styling.highlight_max_value(df),
+            *table_styling.highlight_max_value(df, key=styles_key),
         ],
         style_table={
             'width': '{}%'.format(100)
@@ -44,12 +106,30 @@ def stat_table_day():
     )
 
 
-def stat_table_week():
-    df = database.get_stats_df("week").sort_values("week", ascending=False)
+def stat_table_day():
+    return _paged_table(
+        "stats-day",
+        [
+            dict(id='date', name='Date', type='datetime'),
+            dict(id='earthquakes', name='Earthquakes count', type='numeric'),
+            table_styling.ColumnFormat("depth_min", "Minimum Depth").depth(),
+            table_styling.ColumnFormat("depth_max", "Maximum Depth").depth(),
+            table_styling.ColumnFormat("depth_mean", "Mean Depth").depth(),
+            table_styling.ColumnFormat("mag_min", "Minimum Magnitude").magnitude(),
+            table_styling.ColumnFormat("mag_max", "Maximum Magnitude").magnitude(),
+            table_styling.ColumnFormat("mag_mean", "Mean Magnitude").magnitude(),
+            table_styling.ColumnFormat("energy", "Energy release (in joules)").energy(),
+        ],
+        database.get_stats_df("date"),
+        [dict(column_id="date", direction="desc")],
+        _styles_key("stats-day"),
+    )
 
-    # TODO: Work this into a a component so it can be used by all the table stats
-    return dash_table.DataTable(
-        columns=[
+
+def stat_table_week():
+    return _paged_table(
+        "stats-week",
+        [
             dict(id='week', name='Week number', type='datetime'),
             dict(id='earthquakes', name='Earthquakes count', type='numeric'),
             table_styling.ColumnFormat("depth_min", "Minimum Depth").depth(),
@@ -60,28 +140,14 @@ def stat_table_week():
             table_styling.ColumnFormat("mag_mean", "Mean Magnitude").magnitude(),
             table_styling.ColumnFormat("energy", "Energy release (in joules)").energy(),
         ],
-        data=df.to_dict('records'),
-        sort_action="native",
-        style_cell=dict(textAlign='left'),
-        style_header=dict(
-            backgroundColor='rgb(30,30,30)',
-            color='white'
-            ),
-        style_data=dict(
-            backgroundColor='rgb(50,50,50)',
-            color='white'
-            ),
-        style_table={
-            'width': '{}%'.format(100)
-        },
-        style_data_conditional=[
-            table_styling.every_other_rows(df),
-            *table_styling.highlight_max_value(df),
-        ],
+        database.get_stats_df("week"),
+        [dict(column_id="week", direction="desc")],
+        _styles_key("stats-week"),
     )
 
 
 def stat_table_total():
+    # A single row, not worth a page callback
     df = database.get_stats_df("all")
 
     # TODO: Work this into a a component so it can be used by all the table stats
@@ -113,35 +179,68 @@ def stat_table_total():
 
 
 def today_eqs():
-    master_df = database.get_unfiltered_df().sort_values("time", ascending=False)
-
-    df = master_df[master_df["date"] == dt.utcnow().date()][["time", "mag", "depth", "coordinate", "energy"]]
-
-    return dash_table.DataTable(
-        id='today_eq',
-        columns=[
+    return _paged_table(
+        "today_eq",
+        [
             dict(id='time', name='Datetime', type='datetime'),
             table_styling.ColumnFormat("depth", "Depth").depth(),
             table_styling.ColumnFormat("mag", "Magnitude").magnitude(),
             table_styling.ColumnFormat("energy", "Energy release (in joules)").energy(),
             dict(id='coordinate', name='Coordinate', type='text'),
         ],
-        data=df.to_dict('records'),
-        sort_action="native",
-        style_cell=dict(textAlign='left'),
-        style_header=dict(
-            backgroundColor='rgb(30,30,30)',
-            color='white'
-            ),
-        style_data=dict(
-            backgroundColor='rgb(50,50,50)',
-            color='white'
-            ),
-        style_table={
-            'width': '{}%'.format(100)
-        },
-        style_data_conditional=[
-            table_styling.every_other_rows(df),
-            *table_styling.highlight_max_value(df),
-        ],
-    )
\ No newline at end of file
+        get_today_df(),
+        [dict(column_id="time", direction="desc")],
+        _styles_key("today_eq", dt.utcnow().date()),
+    )
+
+
+@app.callback(
+    [
+        Output("stats-day", "data"),
+        Output("stats-day", "page_count"),
+    ],
+    [
+        Input("stats-day", "page_current"),
+        Input("stats-day", "page_size"),
+        Input("stats-day", "sort_by"),
+    ]
+)
+def stats_day_page(page_current, page_size, sort_by):
+    df = database.get_stats_df("date")
+    page = get_page(df, page_current, page_size, sort_by, [dict(column_id="date", direction="desc")])
+    page = page.assign(date=page["date"].dt.strftime("%Y-%m-%d"))
+    return page.to_dict('records'), page_count(df, page_size)
+
+
+@app.callback(
+    [
+        Output("stats-week", "data"),
+        Output("stats-week", "page_count"),
+    ],
+    [
+        Input("stats-week", "page_current"),
+        Input("stats-week", "page_size"),
+        Input("stats-week", "sort_by"),
+    ]
+)
+def stats_week_page(page_current, page_size, sort_by):
+    df = database.get_stats_df("week")
+    page = get_page(df, page_current, page_size, sort_by, [dict(column_id="week", direction="desc")])
+    return page.to_dict('records'), page_count(df, page_size)
+
+
+@app.callback(
+    [
+        Output("today_eq", "data"),
+        Output("today_eq", "page_count"),
+    ],
+    [
+        Input("today_eq", "page_current"),
+        Input("today_eq", "page_size"),
+        Input("today_eq", "sort_by"),
+    ]
+)
+def today_eqs_page(page_current, page_size, sort_by):
+    df = get_today_df()
+    page = get_page(df, page_current, page_size, sort_by, [dict(column_id="time", direction="desc")])
+    return page.to_dict('records'), page_count(df, page_size)
@@ -3,11 +3,9 @@ import logging
 import dash_bootstrap_components as dbc
 from dash import html
 from dash.dependencies import Input, Output
-import plotly.express as px
 import plotly.graph_objects as go
-import pandas as pd
 
-from ..data import database, calculations
+from ..data import database, calculations, figure_cache
 
 # load app
 from ..server import app
@@ -24,29 +22,30 @@ logger = logging.getLogger(__name__)
         Input("depth-slider", "value")
     ]
 )
+@figure_cache.cached_figure
 def quakes_treemap(start_date, end_date, magnitude_range, depth_range):
-    df = database.get_unfiltered_df()
-    date_mask, mag_mask, depth_mask = calculations.filter_data(df, start_date, end_date, magnitude_range, depth_range)
-
-    df = df.groupby(['week', 'date', 'mag']).size().reset_index(name='count')
-    df = df[date_mask & mag_mask & depth_mask]
-
-    # To prevent exceptions, return empty figure if there are no values
-    try:
-        fig = px.treemap(
-            df,
-            path=[px.Constant("La Palma"), 'week', 'date', 'mag'],
-            values='count',
-            color='count',
-            hover_data={
-                "count": False,
-                "date": True,
-                "week": True,
-                "mag": True
-            },
-            title='Earthquakes sorted on week, day, magnitude',
+    leaves = database.get_treemap_leaves(start_date, end_date, magnitude_range, depth_range)
+
+    # Return empty figure if there are no values
+    if leaves.empty:
+        return go.Figure()
+
+    # The hierarchy is built from the cached leaf counts, px.treemap would aggregate every level again
+    nodes = calculations.treemap_nodes(leaves)
+    fig = go.Figure(
+        go.Treemap(
+            ids=nodes["id"],
+            labels=nodes["label"],
+            parents=nodes["parent"],
+            values=nodes["count"],
+            branchvalues="total",
+            marker=dict(colors=nodes["color"], coloraxis="coloraxis"),
+            hovertemplate="%{currentPath}%{label}<br>count=%{value}<extra></extra>",
         )
-    except Exception as e:
-        logger.error(f"Failed to load figure: {e}")
-        fig = go.Figure()
-    return fig
\ No newline at end of file
+    )
+    fig.update_layout(
+        title='Earthquakes sorted on week, day, magnitude',
+        coloraxis_colorbar=dict(title="count"),
+        margin=dict(t=60),
+    )
+    return fig
@@ -15,7 +15,8 @@ MAP_STYLES = {
 
 MAP_TYPES = {
     "Default": "scatter",
-    "Heatmap": "heatmap"
+    "Heatmap": "heatmap",
+    "Energy heatmap": "energy-heatmap",
 }
 
 def map_option():
@@ -0,0 +1,115 @@
+import logging
+import math
+import os
+import struct
+import threading
+
+import numpy as np
+import plotly.graph_objects as go
+
+from . import calculations
+
+
+logger = logging.getLogger(__name__)
+
+MAP_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "assets", "map.png")
+# Largest side, in points, of the basemap surface sent with the 3D map
+RESOLUTION = int(os.environ.get("BASEMAP_RESOLUTION", 300))
+
+# coordinates of the map, changing this will fuck up the scaling, need a new map if you want to change this
+LAT_MIN = 28.4007
+LAT_MAX = 28.7105
+LON_MIN = -17.9915
+LON_MAX = -17.6973
+# Issue: Map is off coordinates by only a tiny bit. Shifting entire plot slightly.
+# Do note: Only changes physical location on map, it doesn't change the actual coordinates.
+LAT_SHIFT = -0.025
+LON_SHIFT = 0.025
+
+_lock = threading.Lock()
+_basemap = {}
+
+
+def _load():
+    # skimage is slow to import, only pay for it when the basemap is first needed
+    from skimage import io
+
+    logger.info(f"Loading basemap {MAP_FILE}")
+    volume = io.imread(MAP_FILE).T
+    gray = volume[0]
+    r, c = gray.shape
+
+    # The surface keeps the coordinates of the full image, so the scaled events still line up
+    step = max(1, math.ceil(max(r, c) / RESOLUTION))
+    rows = np.arange(0, r, step)
+    cols = np.arange(0, c, step)
+    decimated = gray[::step, ::step]
+
+    _basemap["surface"] = go.Surface(
+        x=cols,
+        y=rows,
+        z=np.zeros(decimated.shape, dtype=np.uint8),
+        surfacecolor=decimated,
+        colorscale='Gray',
+        showscale=False,
+        opacity=0.5,
+        cmin=0, cmax=255,
+        hoverinfo='skip'    # hoverinfo is turned off, but trace is still a plane. Can't get the data underneath it sadly
+    )
+
+
+def _shape():
+    """Rows and columns of the transposed basemap image, i.e. its width and height
+
+    Read from the PNG header, scaling the coordinates doesn't need the image itself.
+    """
+    with open(MAP_FILE, "rb") as inf:
+        header = inf.read(24)
+    if header[:8] != b"\x89PNG\r\n\x1a\n" or header[12:16] != b"IHDR":
+        raise ValueError(f"{MAP_FILE} is not a PNG image")
+    width, height = struct.unpack(">II", header[16:24])
+    return width, height
+
+
+def _get(key):
+    with _lock:
+        if not _basemap:
+            _load()
+        return _basemap[key]
+
+
+def get_surface():
+    """Get the grayscale basemap of the 3D map, loaded and decimated once per process
+
+    Returns:
+        go.Surface: basemap at z=0, in the pixel coordinates of the full image
+    """
+    return _get("surface")
+
+
+def on_map(df):
+    """Mask of the events within the basemap
+
+    Args:
+        df (pd dataframe): dataframe with La Palma dataset
+
+    Returns:
+        pd series: True for the events inside the map bounds
+    """
+    return (df.lat <= LAT_MAX) & (df.lat >= LAT_MIN) & (df.lon <= LON_MAX) & (df.lon >= LON_MIN)
+
+
+def scale_coordinates(lat, lon):
+    """Scale lat and lon to the row and column pixels of the basemap
+
+    Args:
+        lat (np.ndarray): latitudes
+        lon (np.ndarray): longitudes
+
+    Returns:
+        tuple(np.ndarray, np.ndarray): scaled lat and lon (float32)
+    """
+    r, c = _shape()
+    lat_scaled = calculations.scaling(lat + LAT_SHIFT, LAT_MIN, LAT_MAX, c)
+    lon_scaled = calculations.scaling(lon + LON_SHIFT, LON_MIN, LON_MAX, r)
+    return lat_scaled.astype(np.float32), lon_scaled.astype(np.float32)
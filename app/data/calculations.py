@@ -3,50 +3,258 @@ import numpy as np
 from datetime import datetime as dt
 from datetime import timedelta
 
+def _to_day(date):
+    return np.datetime64(dt.fromisoformat(date).date(), "ns")
+
+def date_slice(df, start_date=None, end_date=None):
+    """Get the rows within a date range with a binary search on the date column
+
+    Args:
+        df (pd dataframe): pandas dataframe containing La Palma dataset, sorted by time
+        start_date (str, optional): selected startdate (iso format). Defaults to None.
+        end_date (str, optional): selected enddate (iso format). Defaults to None.
+
+    Returns:
+        slice: positional slice of the rows within the date range
+    """
+    dates = df["date"].to_numpy()
+    start = 0 if start_date is None else np.searchsorted(dates, _to_day(start_date), side="left")
+    end = len(dates) if end_date is None else np.searchsorted(dates, _to_day(end_date), side="right")
+
+    return slice(int(start), int(max(start, end)))
+
+def filter_positions(df, start_date=None, end_date=None, magnitude_range=None, depth_range=None):
+    """Get the positions of the rows matching the selected filters
+
+    The date range is resolved to a contiguous slice first, the magnitude and depth predicates
+    are then only evaluated on that slice.
+
+    Args:
+        df (pd dataframe): pandas dataframe containing La Palma dataset, sorted by time
+        start_date (str, optional): selected startdate (iso format). Defaults to None.
+        end_date (str, optional): selected enddate (iso format). Defaults to None.
+        magnitude_range (list[float], optional): selected magnitude range. Defaults to None.
+        depth_range (list[float], optional): selected depth range. Defaults to None.
+
+    Returns:
+        slice or np.ndarray: date slice if no other predicate applies, positions otherwise
+    """
+    rows = date_slice(df, start_date, end_date)
+    if magnitude_range is None and depth_range is None:
+        return rows
+
+    mask = np.ones(rows.stop - rows.start, dtype=bool)
+    if magnitude_range is not None:
+        mag = df["mag"].to_numpy()[rows]
+        mask &= (mag >= magnitude_range[0]) & (mag <= magnitude_range[1])
+    if depth_range is not None:
+        depth = df["depth"].to_numpy()[rows]
+        mask &= (depth >= depth_range[0]) & (depth <= depth_range[1])
+
+    if mask.all():
+        return rows
+    return rows.start + np.flatnonzero(mask)
+
 def filter_data(df, start_date=None, end_date=None, magnitude_range=None, depth_range=None):
     """Apply selected filter over dataframe
 
     Args:
-        df (pd dataframe): pandas dataframe containing La Palma dataset
-        start_date (datetime, optional): selected startdate. Defaults to None.
-        end_date (datetime, optional): selected enddate. Defaults to None.
+        df (pd dataframe): pandas dataframe containing La Palma dataset, sorted by time
+        start_date (str, optional): selected startdate (iso format). Defaults to None.
+        end_date (str, optional): selected enddate (iso format). Defaults to None.
         magnitude_range (list[float], optional): selected magnitude range. Defaults to None.
         depth_range (list[float], optional): selected depth range. Defaults to None.
 
     Returns:
         pd dataframe: filtered dataset
     """
-    date_mask = (df['date'] >= dt.fromisoformat(start_date).date()) & (df['date'] <= dt.fromisoformat(end_date).date())
-    mag_mask = (df['mag'] >= magnitude_range[0]) & (df['mag'] <= magnitude_range[1])
-    depth_mask = (df['depth'] >= depth_range[0]) & (df['depth'] <= depth_range[1])
-    
-    #return date_mask, mag_mask, depth_mask
-    return date_mask, mag_mask, depth_mask
+    return df.iloc[filter_positions(df, start_date, end_date, magnitude_range, depth_range)]
 
-def get_statistics(df, statistics_level):
-    to_drop = ["depth", "mag"]
+# Columns of the statistics tables, after the statistics level column
+STATISTICS_COLUMNS = ["earthquakes", "energy", "depth_min", "mag_min", "depth_max", "mag_max", "depth_mean", "mag_mean"]
+
+def daily_statistics(df):
+    """Aggregate the events per day in a single groupby pass
 
-    if statistics_level == "all":
-        df["all"] = 1
-        to_drop.append("all")
+    Means are kept as sums so the daily rows can be rolled up to any coarser level
+    (see rollup_statistics) without going through the events again.
+
+    Args:
+        df (pd dataframe): dataframe with La Palma dataset
+
+    Returns:
+        pd dataframe: partial aggregates per day, indexed by date
+    """
+    return df.groupby("date", sort=True).agg(
+        earthquakes=("mag", "size"),
+        energy=("energy", "sum"),
+        depth_min=("depth", "min"),
+        mag_min=("mag", "min"),
+        depth_max=("depth", "max"),
+        mag_max=("mag", "max"),
+        depth_sum=("depth", "sum"),
+        mag_sum=("mag", "sum"),
+        week=("week", "first"),
+    )
 
-    agg_df = df.groupby(statistics_level).size().reset_index(name="earthquakes")
+def rollup_statistics(daily, statistics_level):
+    """Get the statistics of a level from the daily aggregates
 
-    # Need to initialize those 2 columns for the first merge to work.
-    agg_df[["depth", "mag"]] = np.NaN
+    Args:
+        daily (pd dataframe): partial aggregates per day, from daily_statistics
+        statistics_level (str): the level of detail: date, week or all
 
-    agg_df = pd.merge(agg_df, df.groupby(statistics_level)["energy"].sum().round(decimals=4).reset_index(name='energy'), how="left", on=[statistics_level])
-    agg_df = pd.merge(agg_df, df.groupby(statistics_level)[['depth', 'mag']].min().reset_index(), how="left", on=[statistics_level], suffixes=("", "_min"))
-    agg_df = pd.merge(agg_df, df.groupby(statistics_level)[['depth', 'mag']].max().reset_index(), how="left", on=[statistics_level], suffixes=("", "_max"))
-    agg_df = pd.merge(agg_df, df.groupby(statistics_level)[['depth', 'mag']].mean().reset_index(), how="left", on=[statistics_level], suffixes=("", "_mean"))
+    Returns:
+        pd dataframe: one row per level value with the STATISTICS_COLUMNS, a single row without
+            level column for all
+    """
+    if statistics_level == "date":
+        agg_df = daily.reset_index()
+    else:
+        keys = daily["week"] if statistics_level == "week" else np.ones(len(daily), dtype=np.int64)
+        agg_df = daily.groupby(keys, sort=True).agg(
+            earthquakes=("earthquakes", "sum"),
+            energy=("energy", "sum"),
+            depth_min=("depth_min", "min"),
+            mag_min=("mag_min", "min"),
+            depth_max=("depth_max", "max"),
+            mag_max=("mag_max", "max"),
+            depth_sum=("depth_sum", "sum"),
+            mag_sum=("mag_sum", "sum"),
+        )
+        agg_df = agg_df.rename_axis(statistics_level).reset_index()
 
-    agg_df = agg_df.drop(to_drop, axis=1)
+    agg_df["energy"] = agg_df["energy"].round(decimals=4)
+    agg_df["depth_mean"] = agg_df["depth_sum"] / agg_df["earthquakes"]
+    agg_df["mag_mean"] = agg_df["mag_sum"] / agg_df["earthquakes"]
 
+    columns = list(STATISTICS_COLUMNS)
+    if statistics_level != "all":
+        columns.insert(0, statistics_level)
     if statistics_level == "date":
-        agg_df['week'] = pd.to_datetime(agg_df['date']).dt.isocalendar().week
+        columns.append("week")
+    return agg_df[columns]
 
-    return agg_df
+def get_statistics(df, statistics_level):
+    """Get the statistics of the events per date, week or for all of them
+
+    Args:
+        df (pd dataframe): dataframe with La Palma dataset, left untouched
+        statistics_level (str): the level of detail: date, week or all
+
+    Returns:
+        pd dataframe: one row per level value with the STATISTICS_COLUMNS
+    """
+    return rollup_statistics(daily_statistics(df), statistics_level)
     
+def get_daily_counts(df, by):
+    """Count the events per day and per value of a column, the bins of the daily histograms
+
+    Args:
+        df (pd dataframe): dataframe with La Palma dataset
+        by (str): column splitting the daily counts
+
+    Returns:
+        pd dataframe: date, by and count columns, one row per non empty bin
+    """
+    return df.groupby(["date", by], observed=True, sort=True).size().reset_index(name="count")
+
+def treemap_leaves(df):
+    """Count the events per day and magnitude, the leaves of the earthquakes treemap
+
+    Args:
+        df (pd dataframe): dataframe with La Palma dataset
+
+    Returns:
+        pd dataframe: date, week, mag and count columns, sorted by date
+    """
+    return df.groupby(["date", "week", "mag"], observed=True, sort=True).size().reset_index(name="count")
+
+def treemap_nodes(leaves, root="La Palma"):
+    """Build the root -> week -> date -> magnitude hierarchy from the leaf counts
+
+    Parents are summed from their children, so any date range of leaves can be turned into
+    a treemap without going back to the events. Like px.treemap, the color of a parent is
+    the count weighted average of its children's colors.
+
+    Args:
+        leaves (pd dataframe): leaf counts, see treemap_leaves
+        root (str, optional): label of the root node. Defaults to "La Palma".
+
+    Returns:
+        pd dataframe: id, label, parent, count and color of every node, root first
+    """
+    leaves = leaves.assign(
+        week=leaves["week"].astype(str),
+        date=leaves["date"].dt.strftime("%Y-%m-%d"),
+        mag=leaves["mag"].astype(str),
+        weighted=leaves["count"] ** 2,
+    )
+
+    days = leaves.groupby(["week", "date"], sort=True).agg(count=("count", "sum"), weighted=("weighted", "sum")).reset_index()
+    weeks = days.groupby("week", sort=True).agg(count=("count", "sum"), weighted=("weighted", "sum")).reset_index()
+
+    weeks = weeks.assign(id=root + "/" + weeks["week"], parent=root, label=weeks["week"])
+    days = days.assign(parent=root + "/" + days["week"], label=days["date"])
+    days["id"] = days["parent"] + "/" + days["date"]
+    leaves = leaves.assign(parent=root + "/" + leaves["week"] + "/" + leaves["date"], label=leaves["mag"])
+    leaves["id"] = leaves["parent"] + "/" + leaves["mag"]
+    top = pd.DataFrame({
+        "id": [root],
+        "label": [root],
+        "parent": [""],
+        "count": [leaves["count"].sum()],
+        "weighted": [leaves["weighted"].sum()],
+    })
+
+    columns = ["id", "label", "parent", "count", "weighted"]
+    nodes = pd.concat([top, weeks[columns], days[columns], leaves[columns]], ignore_index=True)
+    nodes["color"] = nodes["weighted"] / nodes["count"]
+    return nodes.drop(columns="weighted")
+
+def lttb(x, y, n_out):
+    """Pick the points of a line to keep with the largest triangle three buckets algorithm
+
+    The points between the first and the last one are split in n_out - 2 buckets, the point of
+    each bucket forming the largest triangle with the point kept in the previous bucket and the
+    average of the next bucket is kept. Peaks and the overall shape of the line survive.
+
+    Args:
+        x (np.ndarray): x values, sorted (datetime64 or numeric)
+        y (np.ndarray): y values
+        n_out (int): number of points to keep
+
+    Returns:
+        np.ndarray: positions of the kept points, sorted
+    """
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    x = np.asarray(x)
+    if np.issubdtype(x.dtype, np.datetime64):
+        x = x.astype("datetime64[ns]").astype(np.int64)
+    x = x.astype(np.float64) - float(x[0])
+    y = np.asarray(y, dtype=np.float64)
+
+    # Bucket i spans edges[i]:edges[i + 1], the last "bucket" is the last point
+    every = (n - 2) / (n_out - 2)
+    edges = np.append((np.arange(n_out - 1) * every).astype(np.int64) + 1, n)
+
+    kept = np.empty(n_out, dtype=np.int64)
+    kept[0] = a = 0
+    for i in range(n_out - 2):
+        start, end = edges[i], edges[i + 1]
+        next_x = x[end:edges[i + 2]].mean()
+        next_y = y[end:edges[i + 2]].mean()
+
+        area = np.abs((x[a] - next_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (next_y - y[a]))
+        a = start + int(np.argmax(area))
+        kept[i + 1] = a
+    kept[-1] = n - 1
+
+    return kept
+
 def get_color_map():
     c_map = {
         pd.Interval(left=0, right=2): "rgb(255, 142, 37)",
@@ -57,18 +265,16 @@ def get_color_map():
     }
     return c_map
 
-def get_n_bins(df, groupby):
-    """get the number of bins using groupby
+def format_coordinates(df):
+    """Format lat and lon as a "lat, lon" string for display
 
     Args:
         df (pd dataframe): dataframe with La Palma dataset
-        groupby (list): List of every column the dataframe has to use
 
     Returns:
-        int: Number of bins
+        pd series: coordinates as strings
     """
-    n_bins = len(df.groupby(groupby))
-    return n_bins
+    return df["lat"].astype(str) + ", " + df["lon"].astype(str)
 
 # Probably could've done this in-line, but it would've been too difficult to read
 def scaling(data, minscaling, maxscaling, maxpxcount):
@@ -0,0 +1,66 @@
+import logging
+import os
+
+import numpy as np
+import plotly.graph_objects as go
+
+from ..styles.webgl import WEBGL_THRESHOLD
+
+
+logger = logging.getLogger(__name__)
+
+# Ship the events of the selected dates to the browser and filter them there on slider changes
+ENABLED = os.environ.get("CLIENTSIDE_FILTERING", "").lower() in ("1", "true", "yes")
+
+# Columns sent to the browser, everything the client side graphs are built from
+EVENT_COLUMNS = ["time", "lat", "lon", "depth", "mag"]
+
+# Layouts of the graphs built in the browser (assets/clientside.js), the template is added
+# when they're serialized so they look the same as the ones built by plotly express
+LAYOUTS = {
+    "scatter-depth": dict(
+        title=dict(text="Earthquakes over time by depth (colored by magnitude)"),
+        xaxis=dict(title=dict(text="time")),
+        yaxis=dict(title=dict(text="y")),
+        coloraxis=dict(colorbar=dict(title=dict(text="mag"))),
+        legend=dict(tracegroupgap=0, itemsizing="constant"),
+    ),
+    "line-daily-earthquakes": dict(
+        title=dict(text="Daily earthquakes."),
+        xaxis=dict(title=dict(text="date")),
+        yaxis=dict(title=dict(text="earthquakes")),
+        legend=dict(tracegroupgap=0),
+    ),
+}
+
+_layouts = {}
+
+
+def get_layouts():
+    """Get the layouts of the client side graphs with the default template applied
+
+    Returns:
+        dict: layout per graph id
+    """
+    if not _layouts:
+        for graph_id, layout in LAYOUTS.items():
+            _layouts[graph_id] = go.Figure(layout=layout).to_plotly_json()["layout"]
+    return _layouts
+
+
+def event_columns(df):
+    """Get the events as compact columns for a dcc.Store
+
+    Args:
+        df (pd dataframe): (date filtered) dataframe with La Palma dataset, sorted by time
+
+    Returns:
+        dict: list of values per column of EVENT_COLUMNS, times as iso strings
+    """
+    return {
+        "time": np.datetime_as_string(df["time"].to_numpy(), unit="s").tolist(),
+        "lat": df["lat"].tolist(),
+        "lon": df["lon"].tolist(),
+        "depth": df["depth"].tolist(),
+        "mag": df["mag"].tolist(),
+    }
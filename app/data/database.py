@@ -1,21 +1,84 @@
+import hashlib
 import logging
 import os
+import time
+from datetime import datetime as dt
 
+import numpy as np
 import pandas as pd
-from urllib.parse import urlparse
 import psycopg2
 
-from .db_helper import tools
+from .db_helper import pool, tools
 from ..server import cache
-from . import calculations
-
-
-DB_URL = urlparse(os.environ.get("DATABASE_URL"))
-DB_HOST = DB_URL.hostname
-DB_PORT = DB_URL.port
-DB_NAME = DB_URL.path[1:]
-DB_USER = DB_URL.username
-DB_PASS = DB_URL.password
+from . import basemap, calculations, energy_index, lru, snapshot, spatial
+
+
+# "incremental" only fetches rows whose last_update is at or after the watermark of the resident frame, "full" reloads everything
+REFRESH_MODE = os.environ.get("MASTER_DF_REFRESH_MODE", "incremental")
+# Even in incremental mode, do a full reload every so often to pick up deleted rows
+FULL_RELOAD_INTERVAL = int(os.environ.get("MASTER_DF_FULL_RELOAD_INTERVAL", 3600))
+
+# Seconds before the master dataframe is refreshed
+MASTER_DF_TIMEOUT = 60
+# Cache key of the version of the cached master dataframe, reading it doesn't unpickle the dataframe
+VERSION_CACHE_KEY = "master_df_version"
+
+# Number of filtered dataframes kept per worker, shared by all the callbacks
+FILTER_CACHE_SIZE = int(os.environ.get("FILTER_CACHE_SIZE", 16))
+_filtered_dfs = lru.LRUCache(FILTER_CACHE_SIZE)
+# Daily aggregates and their rollups of the whole dataset, per dataset version
+_statistics = lru.LRUCache(8)
+# Marker clusters of the scatter map per dataset version and filters
+_cluster_indexes = lru.LRUCache(8)
+# Treemap leaf counts per day of the whole dataset, per dataset version and magnitude/depth filters
+_treemap_leaves = lru.LRUCache(8)
+# Energy prefix sums per magnitude and depth band, updated with every new dataset version
+_energy_index = energy_index.EnergyIndex()
+
+# Last loaded raw catalog and its last_update watermark, kept between refreshes. With the shared
+# snapshot the raw catalog is rebuilt from the snapshot instead, see _resume_from_snapshot
+_resident = {
+    "raw": None,
+    "watermark": None,
+    "full_loaded_at": 0.0,
+}
+
+
+# Magnitude bins, right closed like pd.Interval defaults
+M_BINS = [
+    pd.Interval(left=0, right=2),
+    pd.Interval(left=2, right=3),
+    pd.Interval(left=3, right=4),
+    pd.Interval(left=4, right=5),
+    pd.Interval(left=5, right=float("inf"))
+]
+
+
+def _naive_datetime(s):
+    """Convert a column to datetime64 and drop the timezone, keeping the wall time"""
+    s = pd.to_datetime(s)
+    if s.dt.tz is not None:
+        s = s.dt.tz_localize(None)
+    return s
+
+
+# Columns of the processed dataframe coming from quake_data as is
+SOURCE_COLUMNS = [
+    "lastupdate", "magtype", "evtype", "lon", "lat", "depth", "unid", "mag", "time", "source_id",
+    "source_catalog", "flynn_region",
+]
+
+# Repeated strings stored as categoricals
+CATEGORY_COLUMNS = ["magtype", "evtype", "flynn_region", "source_catalog"]
+
+# Downcasted columns. Measured values (lat, lon, mag), mag_mean and energies stay float64, float32
+# doesn't round trip their decimals and they're displayed as is in hovers, legends and tables.
+COMPACT_DTYPES = {
+    "depth": "int16",
+    "week": "uint8",
+    "depth_mean": "float32",
+    "daily_eq": "int32",
+}
 
 
 def process_data(d):
@@ -24,114 +87,444 @@ def process_data(d):
     ## Tranform data
 
     # Remove timezone info to remove numpy deprecation warning
-    master_df["time"] = master_df["time"].apply(lambda x: x.replace(tzinfo=None))
-    master_df["lastupdate"] = master_df["lastupdate"].apply(lambda x: x.replace(tzinfo=None))
-
-    master_df["lastupdate"] = pd.to_datetime(master_df["lastupdate"])
-    master_df["time"] = pd.to_datetime(master_df["time"])
-    master_df["date"] = master_df["time"].dt.date
+    master_df["lastupdate"] = _naive_datetime(master_df["lastupdate"])
+    master_df["time"] = _naive_datetime(master_df["time"])
+    # Day as datetime64 (midnight) rather than python dates
+    master_df["date"] = master_df["time"].dt.normalize()
 
     master_df["depth"] = master_df.depth.astype(int)
 
-    # Enrich data
+    for col in CATEGORY_COLUMNS:
+        master_df[col] = master_df[col].astype("category")
 
-    # Add string coordinate
-    master_df["coordinate"] = master_df["lat"].astype(str) + ", " + master_df["lon"].astype(str)
+    # Enrich data
 
     # Add week number
     master_df['week'] = master_df['time'].dt.isocalendar().week
 
     # Create magnitude bins
-    m_bins = [
-        pd.Interval(left=0, right=2),
-        pd.Interval(left=2, right=3),
-        pd.Interval(left=3, right=4),
-        pd.Interval(left=4, right=5),
-        pd.Interval(left=5, right=float("inf"))
-    ]
-
-    # m_bins_small = [
-    #     pd.Interval(left=-float("inf"), right=3),
-    #     pd.Interval(left=3, right=float("inf")),
-    # ]
-
-    magnitude_ranges = []
-    for index, row in master_df.iterrows():
-        for r in m_bins:
-            if row["mag"] in r:
-                magnitude_ranges.append(r)
-
-    master_df['mag_range'] = magnitude_ranges
-
-    # Auto create bins
-    # master_df['mag_range'] = pd.cut(master_df['mag'], bins = 5)
+    # An IntervalIndex would turn the edges into floats ("(0.0, 2.0]"), keep the M_BINS intervals as labels
+    codes = pd.cut(master_df["mag"], bins=pd.IntervalIndex(M_BINS)).cat.codes
+    master_df['mag_range'] = pd.Categorical.from_codes(codes, categories=pd.Index(M_BINS, dtype=object))
 
     # Add mean magnitude and depth per day
-    master_df = pd.merge(master_df, master_df.groupby("date").mean().round(decimals=1)[["mag", "depth"]], on="date", suffixes=("", "_mean"), how="right")
-    master_df = pd.merge(master_df, master_df.groupby("date").size().reset_index(name='daily_eq'), how="left", on=["date"])
+    daily = master_df.groupby("date")
+    master_df["mag_mean"] = daily["mag"].transform("mean").round(decimals=1)
+    master_df["depth_mean"] = daily["depth"].transform("mean").round(decimals=1)
+    master_df["daily_eq"] = daily["mag"].transform("size")
 
     # Add Energy equivalent in Joule
-    master_df["energy"] = master_df.mag.apply(lambda x: 10 ** (1.5 * x + 4.8))
-    master_df = pd.merge(master_df, master_df.groupby("date")["energy"].sum().reset_index(name='daily_energy'), how="left", on=["date"])
+    master_df["energy"] = 10 ** (1.5 * master_df["mag"] + 4.8)
+
+    # Pixel coordinates on the basemap of the 3D map
+    master_df["lat_scaled"], master_df["lon_scaled"] = basemap.scale_coordinates(master_df["lat"].to_numpy(), master_df["lon"].to_numpy())
+
+    master_df = master_df.astype(COMPACT_DTYPES)
 
     master_df = master_df.sort_values("time", ignore_index=True)
-    master_df["cumEnergy"] = master_df.energy.cumsum()
 
     return master_df
 
 
+def memory_report(df):
+    """Memory used by each column of a dataframe
+
+    Args:
+        df (pd dataframe): dataframe to inspect
+
+    Returns:
+        pd dataframe: dtype, size in bytes and share of the total for every column (and the index)
+    """
+    usage = df.memory_usage(index=True, deep=True)
+    dtypes = df.dtypes.astype(str)
+    dtypes["Index"] = type(df.index).__name__
+
+    report = pd.DataFrame({
+        "dtype": dtypes,
+        "bytes": usage,
+    }).loc[usage.index]
+    report["share"] = (report["bytes"] / usage.sum()).round(decimals=3)
+
+    return report.sort_values("bytes", ascending=False)
+
+
+def upsert_rows(raw_df, new_df):
+    """Insert new rows and replace revised ones (matched on unid) in the raw catalog
+
+    Args:
+        raw_df (pd dataframe): resident raw catalog
+        new_df (pd dataframe): new or revised rows
+
+    Returns:
+        pd dataframe: updated raw catalog, ordered by time like the full query
+    """
+    raw_df = pd.concat([raw_df, new_df], ignore_index=True)
+    raw_df = raw_df.drop_duplicates("unid", keep="last")
+
+    return raw_df.sort_values("time", ascending=False, ignore_index=True)
+
+
+def _watermark(raw_df):
+    if raw_df.empty:
+        return None
+    return raw_df["lastupdate"].max().to_pydatetime()
+
+
+def _full_reload_due():
+    if REFRESH_MODE != "incremental" or _resident["raw"] is None:
+        return True
+    return time.time() - _resident["full_loaded_at"] > FULL_RELOAD_INTERVAL
+
+
+def _dataset_version(df):
+    """Identify the content of the master dataframe, changes when rows are added, updated or deleted
+
+    last_update is only precise to the minute, so the version is a hash of the source columns
+    of every row. The row hashes are sorted, the same rows give the same version in any order.
+    """
+    if df.empty:
+        return "0"
+    row_hashes = np.sort(pd.util.hash_pandas_object(df[SOURCE_COLUMNS], index=False).to_numpy())
+    return f"{len(df)}:{hashlib.sha1(row_hashes.tobytes()).hexdigest()}"
+
+
+def dataset_version(df):
+    """get the version of the data a dataframe was derived from, used to key caches
+
+    Args:
+        df (pd dataframe): master dataframe, or a dataframe derived from it
+
+    Returns:
+        str: dataset version
+    """
+    return df.attrs.get("version")
+
+
+def _refresh_raw_df(conn):
+    """Bring the resident raw catalog up to date, either with a full reload or an incremental fetch
+
+    Returns:
+        pd dataframe: raw catalog
+    """
+    if _full_reload_due() or _resident["watermark"] is None:
+        logging.info("Full reload of quake_data")
+        raw_df = tools.copy_all_from_db(conn)
+        # Wall clock, it's shared with the other workers through the snapshot
+        _resident["full_loaded_at"] = time.time()
+    else:
+        new_rows = tools.get_new_data_from_db(conn, _resident["watermark"], columnar=True)
+        logging.info(f"Incremental refresh of quake_data, {len(new_rows)} new or updated rows since {_resident['watermark']}")
+        raw_df = _resident["raw"]
+        if not new_rows.empty:
+            raw_df = upsert_rows(raw_df, new_rows)
+
+    _resident["raw"] = raw_df
+    _resident["watermark"] = _watermark(raw_df)
+
+    return raw_df
+
+
 def _get_master_df():
 
     logging.info(f"master_df requested")
     try:
-        conn = psycopg2.connect(f"host={DB_HOST} port={DB_PORT} dbname={DB_NAME} user={DB_USER} password={DB_PASS}")
-    except Exception as e:
-        logging.error(f"Something f'd up with psycopg: {e}")
-        exit(1)
-
-    db_data = tools.get_all_from_db(conn)
-    master_df = process_data(db_data)
+        raw_df = pool.run(_refresh_raw_df)
+    except psycopg2.Error as e:
+        # Keep serving the last loaded data instead of taking the worker down
+        if _resident["raw"] is None:
+            raise
+        logging.error(f"Failed to refresh master_df, using previous data: {e}")
+        raw_df = _resident["raw"]
+
+    # process_data transforms columns in place, keep the resident raw frame untouched
+    master_df = process_data(raw_df.copy())
+    master_df.attrs["version"] = _dataset_version(master_df)
+    logging.info(f"master_df loaded, {len(master_df)} rows, {master_df.memory_usage(deep=True).sum() / 2**20:.1f} MiB")
 
     return master_df
 
-@cache.memoize(timeout=60)# TODO: Not sure if this is a good idea how I've implemented this. 
+def _raw_catalog(df):
+    """Turn the source columns of a master dataframe back into a raw catalog, like the loaders return it"""
+    raw_df = df[SOURCE_COLUMNS].copy()
+    for col in ["lastupdate", "time"]:
+        raw_df[col] = raw_df[col].dt.tz_localize("UTC")
+    for col in CATEGORY_COLUMNS:
+        raw_df[col] = raw_df[col].astype(object)
+    return raw_df
+
+def _resume_from_snapshot(manifest):
+    """Seed the resident raw catalog from the current snapshot
+
+    The loader doesn't keep its own copy of the raw catalog between refreshes, whichever worker
+    refreshes the snapshot next rebuilds it from the snapshot and only fetches the updated rows.
+    """
+    state = (manifest or {}).get("state") or {}
+    if REFRESH_MODE != "incremental" or time.time() - state.get("full_loaded_at", 0.0) > FULL_RELOAD_INTERVAL:
+        return
+
+    raw_df = _raw_catalog(snapshot.attach(manifest))
+    _resident.update(raw=raw_df, watermark=_watermark(raw_df), full_loaded_at=state["full_loaded_at"])
+
+@cache.memoize(timeout=MASTER_DF_TIMEOUT)# TODO: Not sure if this is a good idea how I've implemented this. 
+def _get_cached_master_df():
+    df = _get_master_df()
+    # Set before memoize stores the dataframe, so it never outlives it
+    cache.set(VERSION_CACHE_KEY, dataset_version(df), timeout=MASTER_DF_TIMEOUT)
+    return df
+
+def _get_shared_master_df():
+    """Get the master dataframe from the shared snapshot, refreshing it when it's too old
+
+    Only the worker holding the loader lock talks to the database and publishes a new version,
+    the others keep using the current snapshot in the meantime.
+    """
+    manifest = snapshot.read_manifest()
+    if manifest is None or time.time() - manifest["published_at"] > MASTER_DF_TIMEOUT:
+        # Nothing to serve yet, wait for whoever is loading the data
+        with snapshot.loader_lock(blocking=manifest is None) as acquired:
+            if acquired:
+                # Another worker might have published while we were waiting for the lock
+                manifest = snapshot.read_manifest()
+                if manifest is None or time.time() - manifest["published_at"] > MASTER_DF_TIMEOUT:
+                    try:
+                        _resume_from_snapshot(manifest)
+                        df = _get_master_df()
+                        state = {"full_loaded_at": _resident["full_loaded_at"]}
+                        if manifest is not None and dataset_version(df) == manifest["dataset_version"]:
+                            # Same data, republishing would make every worker attach it again
+                            manifest = snapshot.touch(manifest, state)
+                        else:
+                            manifest = snapshot.publish(df, state)
+                    except psycopg2.Error as e:
+                        if manifest is None:
+                            raise
+                        logging.error(f"Failed to refresh the master_df snapshot, using v{manifest['version']}: {e}")
+                    finally:
+                        # The catalog is in the snapshot now, don't keep a private copy in this worker
+                        _resident["raw"] = None
+
+    return snapshot.attach(manifest)
+
 def get_unfiltered_df():
     """Get unfiltered dataframe
 
     Returns:
         pd dataframe: unfiltered dataset
     """
-    df = _get_master_df()
+    if snapshot.enabled():
+        return _get_shared_master_df()
+
+    df = _get_cached_master_df()
     return df
 
-def get_master_df(start_date=None, end_date=None, magnitude_range=None, depth_range=None):
+def current_version():
+    """get the version of the current master dataframe, without loading it when it's cached
+
+    Returns:
+        str: dataset version
+    """
+    if not snapshot.enabled():
+        version = cache.get(VERSION_CACHE_KEY)
+        if version is not None:
+            return version
+
+    # The attached snapshot is only mapped once, getting it again is cheap
+    return dataset_version(get_unfiltered_df())
+
+def filter_key(start_date=None, end_date=None, magnitude_range=None, depth_range=None):
+    """Normalize the filters so equivalent inputs share the same cache entry
+
+    Returns:
+        tuple: hashable filters
+    """
+    def _day(date):
+        return None if date is None else dt.fromisoformat(date).date().isoformat()
+
+    def _range(values):
+        return None if values is None else tuple(float(v) for v in values)
+
+    return _day(start_date), _day(end_date), _range(magnitude_range), _range(depth_range)
+
+def get_master_df(start_date=None, end_date=None, magnitude_range=None, depth_range=None, df=None):
     """get filtered dataframe
 
+    The filtered dataframe is cached per dataset version, so all the graphs of a page only
+    filter the data once.
+
     Args:
-        df (pd dataframe): pandas dataframe containing La Palma dataset
         start_date (datetime, optional): selected startdate. Defaults to None.
         end_date (datetime, optional): selected enddate. Defaults to None.
         magnitude_range (list[float], optional): selected magnitude range. Defaults to None.
         depth_range (list[float], optional): selected depth range. Defaults to None.
+        df (pd dataframe, optional): unfiltered dataframe if the caller already has it. Defaults to None.
 
     Returns:
         pd dataframe: filtered dataset
     """
-    df = get_unfiltered_df()
-    df = calculations.filter_data(df, start_date=None, end_date=None, magnitude_range=None, depth_range=None)
-    return df
+    if df is None:
+        df = get_unfiltered_df()
+
+    version = dataset_version(df)
+    if version is None:
+        return calculations.filter_data(df, start_date, end_date, magnitude_range, depth_range)
+
+    key = (version, *filter_key(start_date, end_date, magnitude_range, depth_range))
+    filtered_df = _filtered_dfs.get(key)
+    if filtered_df is None:
+        filtered_df = calculations.filter_data(df, start_date, end_date, magnitude_range, depth_range)
+        _filtered_dfs.set(key, filtered_df)
+
+    # Callers may add columns, don't let that leak into the cached dataframe
+    return filtered_df.copy(deep=False)
+
+def get_memory_report():
+    """get memory used by each column of the unfiltered dataframe
+
+    Returns:
+        pd dataframe: memory report, see memory_report
+    """
+    return memory_report(get_unfiltered_df())
+
+def _get_daily_statistics(df):
+    version = dataset_version(df)
+    if version is None:
+        return calculations.daily_statistics(df)
+
+    daily = _statistics.get((version, "daily"))
+    if daily is None:
+        daily = calculations.daily_statistics(df)
+        _statistics.set((version, "daily"), daily)
+    return daily
+
 
 def get_stats_df(statistics_level="date", df=None):
     """get dataframe with extra statistical columns
 
+    Without df, the statistics of the whole dataset are cached per dataset version: the
+    events are aggregated per day once and the week and all levels are rolled up from that.
+
     Args:
-        statistics_level (str, optional): the level of detail for the table: (date, week, total). Defaults to "date".
+        statistics_level (str, optional): the level of detail for the table: (date, week, all). Defaults to "date".
+        df (pd dataframe, optional): (filtered) dataframe to get the statistics of. Defaults to the whole dataset.
 
     Returns:
         pd dataframe: dataframe with statistical columns
     """
+    if df is not None:
+        return calculations.get_statistics(df, statistics_level)
+
+    df = get_unfiltered_df()
+    version = dataset_version(df)
+    stats_df = _statistics.get((version, statistics_level))
+    if stats_df is None:
+        stats_df = calculations.rollup_statistics(_get_daily_statistics(df), statistics_level)
+        if version is not None:
+            _statistics.set((version, statistics_level), stats_df)
+
+    return stats_df.copy()
+
+
+def get_energy_index(df=None):
+    """get the energy prefix sums index, up to date with the dataset
+
+    Args:
+        df (pd dataframe, optional): unfiltered dataframe if the caller already has it. Defaults to None.
+
+    Returns:
+        EnergyIndex: index of the current dataset version
+    """
     if df is None:
         df = get_unfiltered_df()
 
-    df = calculations.get_statistics(df, statistics_level)
-    return df
\ No newline at end of file
+    version = dataset_version(df)
+    if version is None or _energy_index.version != version:
+        _energy_index.update(df, version)
+    return _energy_index
+
+
+def get_cumulative_energy(df, magnitude_range=None, depth_range=None):
+    """get the cumulative energy of the events matching the magnitude and depth ranges
+
+    The energy is accumulated from the start of the dataset, the energy of the matching events
+    before df comes from the energy index.
+
+    Args:
+        df (pd dataframe): dataframe filtered on the ranges (and maybe the dates), sorted by time
+        magnitude_range (list[float], optional): magnitude range df is filtered on. Defaults to None.
+        depth_range (list[float], optional): depth range df is filtered on. Defaults to None.
+
+    Returns:
+        pd series: cumulative energy at every event of df
+    """
+    if df.empty:
+        return pd.Series(dtype="float64", index=df.index)
+
+    unfiltered_df = get_unfiltered_df()
+    first_time = df["time"].to_numpy()[:1]
+
+    before = get_energy_index(unfiltered_df).cumulative(first_time, magnitude_range, depth_range, side="left")
+    if before is not None:
+        before = before[0]
+    else:
+        # Ranges off the slider steps, sum the matching events before df
+        end = int(np.searchsorted(unfiltered_df["time"].to_numpy(), first_time[0], side="left"))
+        before = calculations.filter_data(unfiltered_df.iloc[:end], magnitude_range=magnitude_range, depth_range=depth_range)["energy"].sum()
+
+    return before + df["energy"].cumsum()
+
+
+def get_cluster_index(start_date=None, end_date=None, magnitude_range=None, depth_range=None):
+    """get the marker clusters of the filtered events, cached per dataset version and filters
+
+    Args:
+        start_date (datetime, optional): selected startdate. Defaults to None.
+        end_date (datetime, optional): selected enddate. Defaults to None.
+        magnitude_range (list[float], optional): selected magnitude range. Defaults to None.
+        depth_range (list[float], optional): selected depth range. Defaults to None.
+
+    Returns:
+        spatial.ClusterIndex: clusters of every zoom level
+    """
+    df = get_master_df(start_date, end_date, magnitude_range, depth_range)
+
+    version = dataset_version(df)
+    key = (version, *filter_key(start_date, end_date, magnitude_range, depth_range))
+    index = _cluster_indexes.get(key)
+    if index is None:
+        index = spatial.ClusterIndex(df)
+        if version is not None:
+            _cluster_indexes.set(key, index)
+    return index
+
+
+def get_treemap_leaves(start_date=None, end_date=None, magnitude_range=None, depth_range=None):
+    """get the per day and magnitude counts of the treemap
+
+    The magnitude and depth filters are applied while counting, the leaves of every day are
+    cached per dataset version and those filters. Changing the date range only slices the
+    cached days.
+
+    Args:
+        start_date (datetime, optional): selected startdate. Defaults to None.
+        end_date (datetime, optional): selected enddate. Defaults to None.
+        magnitude_range (list[float], optional): selected magnitude range. Defaults to None.
+        depth_range (list[float], optional): selected depth range. Defaults to None.
+
+    Returns:
+        pd dataframe: leaf counts within the date range, see calculations.treemap_leaves
+    """
+    df = get_unfiltered_df()
+
+    version = dataset_version(df)
+    if version is None:
+        return calculations.treemap_leaves(
+            calculations.filter_data(df, start_date, end_date, magnitude_range, depth_range)
+        )
+
+    key = (version, *filter_key(None, None, magnitude_range, depth_range))
+    leaves = _treemap_leaves.get(key)
+    if leaves is None:
+        leaves = calculations.treemap_leaves(calculations.filter_data(df, None, None, magnitude_range, depth_range))
+        _treemap_leaves.set(key, leaves)
+
+    return leaves.iloc[calculations.date_slice(leaves, start_date, end_date)]
@@ -0,0 +1,229 @@
+import logging
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+from urllib.parse import urlparse
+
+import psycopg2
+import psycopg2.extensions
+import psycopg2.pool
+
+
+logger = logging.getLogger(__name__)
+
+DB_URL = urlparse(os.environ.get("DATABASE_URL"))
+DB_HOST = DB_URL.hostname
+DB_PORT = DB_URL.port
+DB_NAME = DB_URL.path[1:]
+DB_USER = DB_URL.username
+DB_PASS = DB_URL.password
+
+POOL_MIN_CONN = int(os.environ.get("DB_POOL_MIN_CONN", 1))
+POOL_MAX_CONN = int(os.environ.get("DB_POOL_MAX_CONN", 4))
+# Seconds to wait for a free connection when the pool is exhausted
+POOL_TIMEOUT = float(os.environ.get("DB_POOL_TIMEOUT", 30))
+CONNECT_TIMEOUT = int(os.environ.get("DB_CONNECT_TIMEOUT", 10))
+# Default statement timeout in milliseconds, can be overridden per query
+STATEMENT_TIMEOUT = int(os.environ.get("DB_STATEMENT_TIMEOUT", 30000))
+RETRIES = int(os.environ.get("DB_RETRIES", 3))
+RETRY_BACKOFF = float(os.environ.get("DB_RETRY_BACKOFF", 0.5))
+# Connections idle for longer than this (seconds) are pinged before being handed out
+HEALTHCHECK_AFTER = float(os.environ.get("DB_HEALTHCHECK_AFTER", 30))
+
+TRANSIENT_ERRORS = (psycopg2.OperationalError, psycopg2.InterfaceError)
+
+_lock = threading.Lock()
+_state = {
+    "pool": None,
+    "slots": None,
+    "pid": None,
+    "last_used": {},
+}
+
+
+def _create_pool():
+    logger.info(f"Creating connection pool to {DB_HOST}:{DB_PORT}/{DB_NAME} ({POOL_MIN_CONN}-{POOL_MAX_CONN} connections)")
+
+    return psycopg2.pool.ThreadedConnectionPool(
+        POOL_MIN_CONN,
+        POOL_MAX_CONN,
+        host=DB_HOST,
+        port=DB_PORT,
+        dbname=DB_NAME,
+        user=DB_USER,
+        password=DB_PASS,
+        connect_timeout=CONNECT_TIMEOUT,
+        options=f"-c statement_timeout={STATEMENT_TIMEOUT}",
+    )
+
+
+def get_pool():
+    """Get the connection pool of the current process, creating it on first use
+
+    uWSGI forks workers after importing the app, connections can't be shared between
+    processes so every worker gets its own pool.
+
+    Returns:
+        ThreadedConnectionPool: connection pool
+    """
+    with _lock:
+        if _state["pool"] is None or _state["pid"] != os.getpid():
+            _state["pool"] = _create_pool()
+            _state["slots"] = threading.BoundedSemaphore(POOL_MAX_CONN)
+            _state["pid"] = os.getpid()
+            _state["last_used"] = {}
+        return _state["pool"]
+
+
+def close_pool():
+    with _lock:
+        if _state["pool"] is not None and _state["pid"] == os.getpid():
+            _state["pool"].closeall()
+        _state["pool"] = None
+
+
+def is_healthy(conn):
+    """Check if a connection can still be used
+
+    Args:
+        conn (psycopg2 connection): connection to check
+
+    Returns:
+        bool: False if the connection is closed or doesn't answer
+    """
+    if conn.closed:
+        return False
+
+    idle = time.monotonic() - _state["last_used"].get(id(conn), 0.0)
+    if idle < HEALTHCHECK_AFTER:
+        return True
+
+    try:
+        with conn.cursor() as curs:
+            curs.execute("SELECT 1;")
+        conn.rollback()
+    except TRANSIENT_ERRORS:
+        return False
+
+    return True
+
+
+def _checkout(pg_pool):
+    # Broken connections are discarded, try at most once per pool slot before giving up
+    for _ in range(POOL_MAX_CONN + 1):
+        conn = pg_pool.getconn()
+        if is_healthy(conn):
+            return conn
+        logger.warning("Discarding broken database connection")
+        pg_pool.putconn(conn, close=True)
+
+    raise psycopg2.OperationalError("Couldn't get a healthy connection from the pool")
+
+
+@contextmanager
+def connection():
+    """Borrow a connection from the pool
+
+    Blocks for up to POOL_TIMEOUT seconds when all connections are in use. The connection is
+    closed instead of returned to the pool if it broke while it was borrowed.
+
+    Yields:
+        psycopg2 connection: pooled connection
+    """
+    pg_pool = get_pool()
+    slots = _state["slots"]
+
+    if not slots.acquire(timeout=POOL_TIMEOUT):
+        raise psycopg2.pool.PoolError(f"No database connection available after {POOL_TIMEOUT}s")
+
+    conn = None
+    broken = False
+    try:
+        conn = _checkout(pg_pool)
+        yield conn
+    except TRANSIENT_ERRORS as e:
+        broken = not isinstance(e, psycopg2.extensions.QueryCanceledError)
+        raise
+    finally:
+        if conn is not None:
+            if not broken and not conn.closed:
+                try:
+                    conn.rollback()
+                except TRANSIENT_ERRORS:
+                    broken = True
+            broken = broken or bool(conn.closed)
+
+            if broken:
+                _state["last_used"].pop(id(conn), None)
+            else:
+                _state["last_used"][id(conn)] = time.monotonic()
+            pg_pool.putconn(conn, close=broken)
+        slots.release()
+
+
+def _set_statement_timeout(conn, timeout):
+    with conn.cursor() as curs:
+        if timeout is None:
+            curs.execute("RESET statement_timeout;")
+        else:
+            curs.execute("SET statement_timeout = %s;", (int(timeout),))
+    conn.commit()
+
+
+def run(func, *args, timeout=None, retries=RETRIES, **kwargs):
+    """Run func(conn, *args, **kwargs) on a pooled connection
+
+    Transient errors (lost connection, server restarting, ...) are retried with exponential
+    backoff on a fresh connection. func should be safe to call more than once.
+
+    Args:
+        func (callable): function taking a connection as first argument
+        timeout (int, optional): statement timeout in milliseconds for this call. Defaults to STATEMENT_TIMEOUT.
+        retries (int, optional): number of retries on transient errors. Defaults to RETRIES.
+
+    Returns:
+        whatever func returns
+    """
+    attempt = 0
+    while True:
+        try:
+            with connection() as conn:
+                if timeout is not None:
+                    _set_statement_timeout(conn, timeout)
+                try:
+                    return func(conn, *args, **kwargs)
+                finally:
+                    if timeout is not None and not conn.closed:
+                        conn.rollback()
+                        _set_statement_timeout(conn, None)
+
+        except TRANSIENT_ERRORS as e:
+            attempt += 1
+            # A query hitting its statement timeout would most likely time out again
+            if isinstance(e, psycopg2.extensions.QueryCanceledError) or attempt > retries:
+                logger.error(f"Database call failed after {attempt} attempts: {e}")
+                raise
+
+            delay = RETRY_BACKOFF * 2 ** (attempt - 1) * random.uniform(1, 1.5)
+            logger.warning(f"Database call failed ({e}), retrying in {delay:.2f}s ({attempt}/{retries})")
+            time.sleep(delay)
+
+
+def healthcheck():
+    """Check that the database is reachable through the pool
+
+    Returns:
+        bool: True if the database answered
+    """
+    def _ping(conn):
+        with conn.cursor() as curs:
+            curs.execute("SELECT 1;")
+            return curs.fetchone()[0] == 1
+
+    try:
+        return run(_ping, retries=0)
+    except psycopg2.Error as e:
+        logger.error(f"Database healthcheck failed: {e}")
+        return False
@@ -0,0 +1,179 @@
+import logging
+import threading
+
+import numpy as np
+import pandas as pd
+
+
+logger = logging.getLogger(__name__)
+
+# Band widths, the steps of the magnitude and depth sliders. Ranges on these steps are answered
+# from the index, any other range needs a scan of the events.
+MAG_STEP = 0.5
+DEPTH_STEP = 5.0
+
+
+def _bands(values, step):
+    """Band of every value: values on a step edge get their own band (2k), the values strictly
+    between two edges share one (2k + 1). Inclusive ranges on the edges are then whole bands."""
+    q = np.asarray(values, dtype=np.float64) / step
+    edge = np.round(q)
+    on_edge = np.isclose(q, edge)
+    return np.where(on_edge, 2 * edge, 2 * np.floor(q) + 1).astype(np.int64)
+
+
+def _band_range(value_range, step):
+    """First and last band of an inclusive range, None if a bound isn't on a step edge"""
+    if value_range is None:
+        return -np.inf, np.inf
+
+    bounds = np.asarray(value_range, dtype=np.float64) / step
+    edges = np.round(bounds)
+    if not np.allclose(bounds, edges):
+        return None
+    return 2 * edges[0], 2 * edges[1]
+
+
+class EnergyIndex(object):
+    """Prefix sums of the energy per magnitude and depth band
+
+    Every event falls in one (magnitude band, depth band) cell, each cell keeps the times of its
+    events and the running sum of their energy. The cumulative energy of the events matching a
+    magnitude and depth range up to a time is the sum of the prefix sums of the matching cells,
+    without going through the events. Between dataset versions only the cells with new, revised
+    or deleted events are updated.
+    """
+
+    def __init__(self):
+        self.version = None
+        self._rows = None
+        self._cells = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _index_rows(df):
+        return {
+            "unid": pd.Index(df["unid"].to_numpy()),
+            "mag_band": _bands(df["mag"].to_numpy(), MAG_STEP),
+            "depth_band": _bands(df["depth"].to_numpy(), DEPTH_STEP),
+            "time": df["time"].to_numpy(),
+            "energy": df["energy"].to_numpy(dtype=np.float64),
+        }
+
+    @staticmethod
+    def _group_cells(rows, positions):
+        """Split rows (at positions) per cell, each cell ordered by time
+
+        Yields:
+            tuple: cell and the positions of its rows
+        """
+        mag_band = rows["mag_band"][positions]
+        depth_band = rows["depth_band"][positions]
+        order = np.lexsort((rows["time"][positions], depth_band, mag_band))
+
+        keys = np.stack([mag_band[order], depth_band[order]], axis=1)
+        starts = np.flatnonzero(np.r_[True, (keys[1:] != keys[:-1]).any(axis=1)])
+        for start, end in zip(starts, np.r_[starts[1:], len(order)]):
+            yield (int(keys[start, 0]), int(keys[start, 1])), positions[order[start:end]]
+
+    def _build_cells(self, rows, positions):
+        for cell, cell_positions in self._group_cells(rows, positions):
+            self._cells[cell] = (
+                rows["time"][cell_positions],
+                np.concatenate([[0.0], np.cumsum(rows["energy"][cell_positions])]),
+            )
+
+    def _append(self, cell, rows, positions):
+        """Extend a cell with events newer than all of its events, False if it has to be rebuilt"""
+        times = rows["time"][positions]
+        cell_times, cum = self._cells.get(cell, (times[:0], np.zeros(1)))
+        if len(cell_times) and times[0] < cell_times[-1]:
+            return False
+
+        self._cells[cell] = (
+            np.concatenate([cell_times, times]),
+            np.concatenate([cum, cum[-1] + np.cumsum(rows["energy"][positions])]),
+        )
+        return True
+
+    def update(self, df, version=None):
+        """Bring the index up to date with a new version of the master dataframe
+
+        Args:
+            df (pd dataframe): master dataframe
+            version (str, optional): dataset version of df. Defaults to None.
+        """
+        with self._lock:
+            rows = self._index_rows(df)
+            old = self._rows
+
+            # Match the events on unid, duplicated unids (shouldn't happen) can't be matched
+            try:
+                old_positions = None if old is None else old["unid"].get_indexer(rows["unid"])
+            except pd.errors.InvalidIndexError:
+                old_positions = None
+
+            if old_positions is None:
+                self._cells = {}
+                self._build_cells(rows, np.arange(len(df)))
+                self._rows = rows
+                self.version = version
+                return
+
+            known = old_positions >= 0
+            matched = old_positions[known]
+
+            revised = np.zeros(len(df), dtype=bool)
+            for column in ["mag_band", "depth_band", "time", "energy"]:
+                revised[known] |= old[column][matched] != rows[column][known]
+            removed = np.ones(len(old["unid"]), dtype=bool)
+            removed[matched] = False
+            revised_old = old_positions[revised]
+
+            # Cells losing or changing events are rebuilt, the others only get new events appended
+            stale_cells = set()
+            for band_rows, positions in ((old, np.flatnonzero(removed)), (old, revised_old), (rows, np.flatnonzero(revised))):
+                stale_cells.update(zip(band_rows["mag_band"][positions].tolist(), band_rows["depth_band"][positions].tolist()))
+
+            added = np.flatnonzero(~known)
+            for cell, positions in self._group_cells(rows, added):
+                if cell not in stale_cells and not self._append(cell, rows, positions):
+                    stale_cells.add(cell)
+
+            if stale_cells:
+                for cell in stale_cells:
+                    self._cells.pop(cell, None)
+                stale = np.array(sorted(stale_cells), dtype=np.int64).reshape(-1, 2)
+                in_stale = pd.MultiIndex.from_arrays([rows["mag_band"], rows["depth_band"]]).isin(
+                    pd.MultiIndex.from_arrays([stale[:, 0], stale[:, 1]])
+                )
+                self._build_cells(rows, np.flatnonzero(in_stale))
+
+            logger.debug(f"Energy index updated: {len(added)} new, {revised.sum()} revised, {removed.sum()} deleted events, {len(stale_cells)} cells rebuilt")
+            self._rows = rows
+            self.version = version
+
+    def cumulative(self, times, magnitude_range=None, depth_range=None, side="right"):
+        """Cumulative energy of the events matching the ranges up to each time
+
+        Args:
+            times (np.ndarray): datetime64 times
+            magnitude_range (list[float], optional): inclusive magnitude range. Defaults to None.
+            depth_range (list[float], optional): inclusive depth range. Defaults to None.
+            side (str, optional): "right" includes the events at each time, "left" excludes them. Defaults to "right".
+
+        Returns:
+            np.ndarray: energy up to each time, None if a range isn't on the slider steps
+        """
+        mag_bands = _band_range(magnitude_range, MAG_STEP)
+        depth_bands = _band_range(depth_range, DEPTH_STEP)
+        if mag_bands is None or depth_bands is None:
+            return None
+
+        times = np.asarray(times, dtype="datetime64[ns]")
+        total = np.zeros(len(times))
+        with self._lock:
+            for (mag_band, depth_band), (cell_times, cum) in self._cells.items():
+                if mag_bands[0] <= mag_band <= mag_bands[1] and depth_bands[0] <= depth_band <= depth_bands[1]:
+                    total += cum[np.searchsorted(cell_times, times, side=side)]
+        return total
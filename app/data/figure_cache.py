@@ -0,0 +1,67 @@
+import functools
+import json
+import logging
+import os
+
+import plotly.graph_objects as go
+
+from . import database, lru
+
+
+logger = logging.getLogger(__name__)
+
+# Figures kept per worker, as serialized json
+FIGURE_CACHE_SIZE = int(os.environ.get("FIGURE_CACHE_SIZE", 256))
+FIGURE_CACHE_BYTES = int(os.environ.get("FIGURE_CACHE_BYTES", 64 * 1024 ** 2))
+_figures = lru.LRUCache(FIGURE_CACHE_SIZE, maxbytes=FIGURE_CACHE_BYTES)
+
+
+def _normalize(value):
+    """Make the other callback inputs (lists from checklists, ...) hashable"""
+    if isinstance(value, (list, tuple)):
+        return tuple(_normalize(v) for v in value)
+    if isinstance(value, dict):
+        return tuple(sorted((k, _normalize(v)) for k, v in value.items()))
+    return value
+
+
+def figure_key(callback_id, version, start_date, end_date, magnitude_range, depth_range, *args):
+    """Cache key of a figure: the callback, the dataset version and the normalized inputs
+
+    Returns:
+        tuple: hashable key
+    """
+    filters = database.filter_key(start_date, end_date, magnitude_range, depth_range)
+    return (callback_id, version, *filters, *(_normalize(arg) for arg in args))
+
+
+def cached_figure(func):
+    """Cache the figure returned by a graph callback
+
+    The callback has to take the date-picker and the magnitude and depth sliders as its first
+    inputs. Figures are stored as json for the current dataset version, the same inputs get the
+    stored figure back without building it again. Only the figures of the current dataset
+    version are served: a refresh changes the version and the old entries age out of the LRU.
+    """
+    callback_id = f"{func.__module__}.{func.__qualname__}"
+
+    @functools.wraps(func)
+    def wrapper(*args):
+        version = database.current_version()
+        if version is None:
+            return func(*args)
+
+        key = figure_key(callback_id, version, *args)
+        payload = _figures.get(key)
+        if payload is not None:
+            return json.loads(payload)
+
+        fig = func(*args)
+        # Failed builds fall back to an empty figure, don't keep those around
+        if isinstance(fig, go.Figure) and fig.data:
+            payload = fig.to_json()
+            _figures.set(key, payload, size=len(payload))
+        return fig
+
+    return wrapper
+
@@ -0,0 +1,265 @@
+import logging
+import os
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import timedelta
+from datetime import timezone
+from urllib.parse import urlencode
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+logger = logging.getLogger(__name__)
+
+# Base url of the FDSN event service, point it to a local stand-in for testing
+SEISMICPORTAL_URL = os.environ.get("SEISMICPORTAL_URL", "https://www.seismicportal.eu")
+QUERY_PATH = "/fdsnws/event/1/query"
+# Events per page, the service caps it
+PAGE_LIMIT = int(os.environ.get("SEISMICPORTAL_PAGE_LIMIT", 1000))
+# Pages fetched at the same time, also the size of the connection pool
+CONCURRENCY = int(os.environ.get("SEISMICPORTAL_CONCURRENCY", 4))
+# Requests per second over all the threads, 0 disables the limit
+RATE_LIMIT = float(os.environ.get("SEISMICPORTAL_RATE_LIMIT", 5))
+RETRIES = int(os.environ.get("SEISMICPORTAL_RETRIES", 3))
+RETRY_BACKOFF = float(os.environ.get("SEISMICPORTAL_RETRY_BACKOFF", 0.5))
+TIMEOUT = float(os.environ.get("SEISMICPORTAL_TIMEOUT", 30))
+# Length of the time slices a time range is split in
+SLICE_LENGTH = timedelta(days=7)
+
+# Status codes worth retrying, the service answers 204 when there are no events
+RETRY_STATUS = {429, 500, 502, 503, 504}
+TRANSIENT_ERRORS = (requests.ConnectionError, requests.Timeout)
+
+CANARY_BOX = {
+    "min_latitude": 27,
+    "max_latitude": 30,
+    "min_longitude": -18.70,
+    "max_longitude": -13.50,
+}
+
+# Keyword arguments to FDSN query parameters
+QUERY_PARAMETERS = {
+    "min_latitude": "minlat",
+    "max_latitude": "maxlat",
+    "min_longitude": "minlon",
+    "max_longitude": "maxlon",
+    "circle_latitude": "lat",
+    "circle_longitude": "lon",
+    "min_radius": "minradius",
+    "max_radius": "maxradius",
+    "min_depth": "mindepth",
+    "max_depth": "maxdepth",
+    "min_magnitude": "minmag",
+    "max_magnitude": "maxmag",
+    "magnitude_type": "magtype",
+    "include_all_origins": "includeallorigins",
+    "include_arrivals": "includearrivals",
+    "event_id": "eventid",
+    "order_by": "orderby",
+    "contributor": "contributor",
+    "catalog": "catalog",
+    "update_after": "updateafter",
+}
+
+
+class RateLimiter(object):
+    """Space out calls to at most rate per second, shared by all the threads of a client"""
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate else 0.0
+        self._next = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self):
+        if not self.interval:
+            return
+
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next)
+            self._next = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+def _format_time(value):
+    if value is None:
+        return None
+    return value.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%f")
+
+
+def time_slices(start_time, end_time, slice_length=SLICE_LENGTH):
+    """Split a time range in consecutive slices
+
+    Args:
+        start_time (datetime): start of the range
+        end_time (datetime): end of the range
+        slice_length (timedelta, optional): length of a slice. Defaults to SLICE_LENGTH.
+
+    Returns:
+        list[tuple]: (start, end) of every slice, the last one ends at end_time
+    """
+    slices = []
+    start = start_time
+    while start < end_time:
+        end = min(start + slice_length, end_time)
+        slices.append((start, end))
+        start = end
+    return slices
+
+
+class SeismicPortal(object):
+    """Client of the SeismicPortal FDSN event service
+
+    Pages are fetched by a pool of threads sharing one keep-alive session, with at most
+    concurrency requests in flight and no more than rate_limit requests per second. Transient
+    errors are retried with exponential backoff, starting at retry_backoff seconds.
+    """
+
+    def __init__(self, url=SEISMICPORTAL_URL, concurrency=CONCURRENCY, rate_limit=RATE_LIMIT,
+                 retries=RETRIES, retry_backoff=RETRY_BACKOFF, timeout=TIMEOUT, session=None):
+        self.url = url.rstrip("/") + QUERY_PATH
+        self.concurrency = max(1, concurrency)
+        self.retries = retries
+        self.retry_backoff = retry_backoff
+        self.timeout = timeout
+        self.limiter = RateLimiter(rate_limit)
+
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.concurrency)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+        self.session = session
+
+    def close(self):
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _get(self, params):
+        attempt = 0
+        while True:
+            self.limiter.wait()
+            try:
+                r = self.session.get(self.url, params=params, timeout=self.timeout)
+                if r.status_code not in RETRY_STATUS:
+                    break
+                error = f"{r.status_code} {r.reason}"
+            except TRANSIENT_ERRORS as e:
+                error = str(e)
+
+            attempt += 1
+            if attempt > self.retries:
+                logger.error(f"SeismicPortal query failed after {attempt} attempts: {error}")
+                raise ConnectionError(f"SeismicPortal query failed: {error}")
+
+            delay = self.retry_backoff * 2 ** (attempt - 1) * random.uniform(1, 1.5)
+            logger.warning(f"SeismicPortal query failed ({error}), retrying in {delay:.2f}s ({attempt}/{self.retries})")
+            time.sleep(delay)
+
+        if r.status_code == 204:
+            return []
+        if r.status_code != 200:
+            raise ConnectionError(r.status_code, r.reason)
+
+        data = r.json()
+        # If only one result is returned SeismicPortal returns the event without the usual wrapper
+        if data.get("properties"):
+            return [data]
+        return data.get("features") or []
+
+    def query_page(self, start_time=None, end_time=None, limit=PAGE_LIMIT, offset=1, **filters):
+        """Fetch a single page of events
+
+        Args:
+            start_time (datetime, optional): start of the time range. Defaults to None.
+            end_time (datetime, optional): end of the time range. Defaults to None.
+            limit (int, optional): events per page. Defaults to PAGE_LIMIT.
+            offset (int, optional): position of the first event, starting at 1. Defaults to 1.
+            filters: other query parameters, see QUERY_PARAMETERS
+
+        Returns:
+            list[dict]: GeoJSON features of the events
+        """
+        unknown = set(filters) - set(QUERY_PARAMETERS)
+        if unknown:
+            raise TypeError(f"Unknown query parameters: {', '.join(sorted(unknown))}")
+
+        params = {QUERY_PARAMETERS[k]: v for k, v in filters.items() if v}
+        params.update({
+            "start": _format_time(start_time),
+            "end": _format_time(end_time),
+            "limit": limit,
+            "offset": offset,
+            "format": "json",
+        })
+        # The times are sent with literal colons, like the service documents them
+        return self._get(urlencode({k: v for k, v in params.items() if v is not None}).replace("%3A", ":"))
+
+    def iter_events(self, start_time, end_time, slice_length=SLICE_LENGTH, limit=PAGE_LIMIT, **filters):
+        """Stream the events of a time range
+
+        The range is split in time slices which are paged through concurrently: the next page
+        of a slice is requested as soon as a full page comes back. Events are yielded as pages
+        arrive, so they're not in time order, events on the border of two slices are only
+        yielded once.
+
+        Args:
+            start_time (datetime): start of the time range
+            end_time (datetime): end of the time range
+            slice_length (timedelta, optional): length of the time slices. Defaults to SLICE_LENGTH.
+            limit (int, optional): events per page. Defaults to PAGE_LIMIT.
+            filters: other query parameters, see QUERY_PARAMETERS
+
+        Yields:
+            dict: GeoJSON feature of an event
+        """
+        pending = deque((start, end, 1) for start, end in time_slices(start_time, end_time, slice_length))
+        seen = set()
+
+        executor = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="seismicportal")
+        try:
+            running = {}
+            while pending or running:
+                while pending and len(running) < self.concurrency:
+                    start, end, offset = page = pending.popleft()
+                    future = executor.submit(self.query_page, start, end, limit, offset, **filters)
+                    running[future] = page
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    start, end, offset = running.pop(future)
+                    events = future.result()
+                    if len(events) >= limit:
+                        # Served before the slices that haven't started yet
+                        pending.appendleft((start, end, offset + limit))
+
+                    for event in events:
+                        event_id = event.get("id")
+                        if event_id is not None:
+                            if event_id in seen:
+                                continue
+                            seen.add(event_id)
+                        yield event
+        finally:
+            # The consumer may stop early, don't wait for the pages it won't read
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    def download_earthquakes(self, start_time, end_time, **kwargs):
+        """Download the events of a time range, see iter_events
+
+        Returns:
+            list[dict]: GeoJSON features of the events
+        """
+        data = list(self.iter_events(start_time, end_time, **kwargs))
+        logger.info(f"{len(data)} earthquakes downloaded.")
+        return data
@@ -38,7 +38,7 @@ def get_max_depth(df):
     if n % multiple != 0:
         steps += 1
 
-    return steps * multiple
+    return int(steps * multiple)
 
 
 def get_depth_slider_settings(df):
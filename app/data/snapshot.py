@@ -0,0 +1,243 @@
+import fcntl
+import json
+import logging
+import os
+import pickle
+import shutil
+import time
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+# Private pandas API, pandas is pinned in requirements-dash.txt for it. The public constructors
+# build one block per column and the first consolidation would copy the memory mapped columns.
+from pandas.core.internals import BlockManager
+from pandas.core.internals.api import make_block
+
+
+logger = logging.getLogger(__name__)
+
+# Setting this directory enables the shared snapshot of the master dataframe
+SNAPSHOT_DIR = os.environ.get("MASTER_DF_SNAPSHOT_DIR")
+MANIFEST_FILE = "manifest.json"
+LOCK_FILE = "loader.lock"
+# Number of published versions kept on disk, workers might still be reading the previous one
+KEEP_VERSIONS = 2
+
+# Attached snapshot of this process
+_attached = {
+    "version": None,
+    "df": None,
+}
+
+
+def enabled():
+    return bool(SNAPSHOT_DIR)
+
+
+def _path(*parts):
+    return os.path.join(SNAPSHOT_DIR, *parts)
+
+
+def read_manifest():
+    """Read the manifest of the current snapshot
+
+    Returns:
+        dict: manifest, None if nothing was published yet
+    """
+    try:
+        with open(_path(MANIFEST_FILE)) as inf:
+            return json.load(inf)
+    except FileNotFoundError:
+        return None
+
+
+@contextmanager
+def loader_lock(blocking=True):
+    """Elect the process that (re)loads the data, only one worker should hit the database
+
+    Yields:
+        bool: True if the lock was acquired
+    """
+    os.makedirs(SNAPSHOT_DIR, exist_ok=True)
+    with open(_path(LOCK_FILE), "w") as lock:
+        flags = fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB
+        try:
+            fcntl.flock(lock, flags)
+        except BlockingIOError:
+            yield False
+            return
+
+        try:
+            yield True
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def _column_groups(df):
+    """Group the columns the way pandas stores them: one 2D block per numpy dtype, categoricals
+    and python objects on their own"""
+    groups = {}
+    for position, (col, dtype) in enumerate(df.dtypes.items()):
+        if isinstance(dtype, pd.CategoricalDtype):
+            kind = "category"
+        elif dtype == object or isinstance(dtype, pd.api.extensions.ExtensionDtype):
+            kind = "object"
+        else:
+            kind = str(dtype)
+        groups.setdefault(kind, []).append((position, col))
+    return groups
+
+
+def publish(df, state=None):
+    """Write the dataframe columns to a new snapshot version and make it current
+
+    Args:
+        df (pd dataframe): processed master dataframe
+        state (dict, optional): JSON serializable state of the loader, kept in the manifest for
+            the next worker loading the data. Defaults to None.
+
+    Returns:
+        dict: manifest of the published snapshot
+    """
+    previous = read_manifest()
+    version = previous["version"] + 1 if previous else 1
+
+    name = f"v{version}"
+    tmp_dir = _path(f"{name}.tmp")
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+
+    blocks = []
+    for kind, cols in _column_groups(df).items():
+        positions = [position for position, _ in cols]
+
+        if kind == "category":
+            # codes are memory mapped, the categories are small enough to be unpickled
+            for position, col in cols:
+                block_file = f"category_{position}"
+                values = df[col].array
+                np.save(os.path.join(tmp_dir, f"{block_file}.npy"), values.codes)
+                with open(os.path.join(tmp_dir, f"{block_file}.pkl"), "wb") as outf:
+                    pickle.dump(values.dtype, outf)
+                blocks.append({"kind": kind, "file": block_file, "placement": [position]})
+
+        elif kind == "object":
+            # python objects can't be memory mapped, they're unpickled by every worker
+            block_file = "object"
+            with open(os.path.join(tmp_dir, f"{block_file}.pkl"), "wb") as outf:
+                pickle.dump([df[col].to_numpy() for _, col in cols], outf)
+            blocks.append({"kind": kind, "file": block_file, "placement": positions})
+
+        else:
+            block_file = kind.replace("[", "_").replace("]", "")
+            values = np.stack([df[col].to_numpy() for _, col in cols])
+            np.save(os.path.join(tmp_dir, f"{block_file}.npy"), values)
+            blocks.append({"kind": kind, "file": block_file, "placement": positions})
+
+    # Left over by a publish that didn't get to update the manifest
+    shutil.rmtree(_path(name), ignore_errors=True)
+    os.rename(tmp_dir, _path(name))
+
+    manifest = {
+        "version": version,
+        "dataset_version": df.attrs.get("version"),
+        "directory": name,
+        "published_at": time.time(),
+        "rows": len(df),
+        "columns": list(df.columns),
+        "blocks": blocks,
+        "state": state,
+    }
+    _write_manifest(manifest)
+
+    logger.info(f"Published master_df snapshot {name} ({len(df)} rows)")
+    _cleanup(version)
+
+    return manifest
+
+
+def _write_manifest(manifest):
+    with open(_path(f"{MANIFEST_FILE}.tmp"), "w") as outf:
+        json.dump(manifest, outf)
+    os.replace(_path(f"{MANIFEST_FILE}.tmp"), _path(MANIFEST_FILE))
+
+
+def touch(manifest, state=None):
+    """Mark the current snapshot as fresh without publishing a new version
+
+    Used when a refresh didn't change the data, the workers keep their attached snapshot.
+
+    Args:
+        manifest (dict): manifest of the current snapshot
+        state (dict, optional): new state of the loader, see publish. Defaults to None (unchanged).
+
+    Returns:
+        dict: updated manifest
+    """
+    manifest = dict(manifest, published_at=time.time())
+    if state is not None:
+        manifest["state"] = state
+    _write_manifest(manifest)
+    return manifest
+
+
+def _cleanup(version):
+    for entry in os.listdir(SNAPSHOT_DIR):
+        if not entry.startswith("v") or entry.endswith(".tmp"):
+            continue
+        try:
+            old = int(entry[1:])
+        except ValueError:
+            continue
+        if old <= version - KEEP_VERSIONS:
+            shutil.rmtree(_path(entry), ignore_errors=True)
+
+
+def _load(manifest):
+    directory = _path(manifest["directory"])
+    n_rows = manifest["rows"]
+
+    blocks = []
+    for block in manifest["blocks"]:
+        path = os.path.join(directory, block["file"])
+        if block["kind"] == "category":
+            codes = np.load(f"{path}.npy", mmap_mode="r")
+            with open(f"{path}.pkl", "rb") as inf:
+                dtype = pickle.load(inf)
+            values = pd.Categorical.from_codes(codes, dtype=dtype)
+            blocks.append(make_block(values, placement=block["placement"], ndim=2))
+        elif block["kind"] == "object":
+            with open(f"{path}.pkl", "rb") as inf:
+                values = np.stack(pickle.load(inf))
+            blocks.append(make_block(values, placement=block["placement"]))
+        else:
+            values = np.load(f"{path}.npy", mmap_mode="r")
+            blocks.append(make_block(values, placement=block["placement"]))
+
+    # Build the dataframe from one block per dtype (already consolidated), otherwise pandas
+    # would copy the memory mapped columns into a new block the first time it consolidates
+    mgr = BlockManager(blocks, [pd.Index(manifest["columns"]), pd.RangeIndex(n_rows)])
+    return pd.DataFrame(mgr)
+
+
+def attach(manifest):
+    """Get the dataframe of a snapshot, backed by the memory mapped files
+
+    The snapshot is only mapped once per version and process, callers get a shallow copy so
+    adding columns doesn't affect other callers.
+
+    Args:
+        manifest (dict): manifest of the snapshot
+
+    Returns:
+        pd dataframe: master dataframe (read-only columns)
+    """
+    if _attached["version"] != manifest["version"]:
+        logger.info(f"Attaching master_df snapshot v{manifest['version']}")
+        df = _load(manifest)
+        df.attrs["version"] = manifest["dataset_version"] or str(manifest["version"])
+        _attached["df"] = df
+        _attached["version"] = manifest["version"]
+
+    return _attached["df"].copy(deep=False)
@@ -0,0 +1,188 @@
+import logging
+import math
+import os
+
+import numpy as np
+import pandas as pd
+
+
+logger = logging.getLogger(__name__)
+
+# Size of a grid cell on screen, in pixels. Events closer than that are drawn as one point.
+CELL_PIXELS = int(os.environ.get("MAP_CELL_PIXELS", 8))
+# Events closer than this on screen, in pixels, share a marker on the scatter map
+CLUSTER_PIXELS = int(os.environ.get("MAP_CLUSTER_PIXELS", 30))
+# Past this zoom level every event gets its own marker
+CLUSTER_MAX_ZOOM = 16
+# Mapbox GL (scattermapbox, densitymapbox) draws 512px tiles, a tile spans 360 / 2 ** zoom degrees
+TILE_PIXELS = 512
+MAX_ZOOM = 20
+# Zoom of the maps when they're first shown
+DEFAULT_ZOOM = 8
+
+
+def zoom_level(relayout_data):
+    """Get the whole zoom level from a map relayoutData
+
+    Args:
+        relayout_data (dict): relayoutData of a mapbox graph
+
+    Returns:
+        int: zoom level, None if the map zoom didn't change
+    """
+    if not relayout_data or "mapbox.zoom" not in relayout_data:
+        return None
+    return min(max(int(math.floor(relayout_data["mapbox.zoom"])), 0), MAX_ZOOM)
+
+
+def viewport(relayout_data, current=None):
+    """Get the map viewport from a map relayoutData
+
+    The bounds are snapped outwards on the map tiles with a tile of margin, small pans keep the
+    same viewport and don't need new data.
+
+    Args:
+        relayout_data (dict): relayoutData of a mapbox graph
+        current (dict, optional): current viewport. Defaults to None.
+
+    Returns:
+        dict: zoom level and [west, south, east, north] bounds (None when unknown), None if
+            the viewport didn't change
+    """
+    if not relayout_data:
+        return None
+    current = current or {"zoom": DEFAULT_ZOOM, "bounds": None}
+
+    zoom = zoom_level(relayout_data)
+    if zoom is None:
+        zoom = current["zoom"]
+
+    corners = (relayout_data.get("mapbox._derived") or {}).get("coordinates")
+    if corners:
+        lons = [corner[0] for corner in corners]
+        lats = [corner[1] for corner in corners]
+        tile = 360.0 / 2 ** zoom
+        bounds = [
+            (math.floor(min(lons) / tile) - 1) * tile,
+            (math.floor(min(lats) / tile) - 1) * tile,
+            (math.ceil(max(lons) / tile) + 1) * tile,
+            (math.ceil(max(lats) / tile) + 1) * tile,
+        ]
+    elif zoom == current["zoom"]:
+        bounds = current["bounds"]
+    else:
+        bounds = None
+
+    new = {"zoom": zoom, "bounds": bounds}
+    return None if new == current else new
+
+
+def cell_size(zoom, pixels=CELL_PIXELS):
+    """Size in degrees of a grid cell that spans a number of pixels at a zoom level
+
+    Args:
+        zoom (int): map zoom level
+        pixels (int, optional): size of the cell on screen. Defaults to CELL_PIXELS.
+
+    Returns:
+        float: cell size in degrees
+    """
+    return 360.0 / (TILE_PIXELS * 2 ** zoom) * pixels
+
+
+def aggregate_grid(df, size):
+    """Aggregate the events on a regular lat/lon grid
+
+    Args:
+        df (pd dataframe): dataframe with La Palma dataset
+        size (float): cell size in degrees
+
+    Returns:
+        pd dataframe: one row per non empty cell with the centroid of its events (lat, lon), the
+            number of events (count), their magnitude sum (mag), mean squared magnitude
+            (mag_sq) and energy sum (energy)
+    """
+    lat = df["lat"].to_numpy()
+    lon = df["lon"].to_numpy()
+    mag = df["mag"].to_numpy()
+
+    events = pd.DataFrame({
+        "lat": lat,
+        "lon": lon,
+        "mag": mag,
+        "mag_sq": mag ** 2,
+        "energy": df["energy"].to_numpy(),
+    })
+    cells = [np.floor(lat / size).astype(np.int64), np.floor(lon / size).astype(np.int64)]
+
+    grid = events.groupby(cells, sort=False).agg(
+        lat=("lat", "mean"),
+        lon=("lon", "mean"),
+        count=("mag", "size"),
+        mag=("mag", "sum"),
+        mag_sq=("mag_sq", "mean"),
+        energy=("energy", "sum"),
+    )
+    return grid.reset_index(drop=True)
+
+
+class ClusterIndex(object):
+    """Clusters of events for every zoom level, to draw one marker per group of close events
+
+    The events are the level above CLUSTER_MAX_ZOOM. Every level is built from the one above it:
+    the points falling in the same cell of CLUSTER_PIXELS at that zoom are merged into one
+    cluster, at the centroid of its events. A cluster at a zoom level is then always the union
+    of clusters of the level above.
+    """
+
+    def __init__(self, df, max_zoom=CLUSTER_MAX_ZOOM, pixels=CLUSTER_PIXELS):
+        points = pd.DataFrame({
+            "lat": df["lat"].to_numpy(),
+            "lon": df["lon"].to_numpy(),
+            "count": np.ones(len(df), dtype=np.int64),
+            "mag_max": df["mag"].to_numpy(),
+            "mag_sum": df["mag"].to_numpy(),
+        })
+
+        self.max_zoom = max_zoom
+        self.levels = {max_zoom + 1: points}
+        for zoom in range(max_zoom, -1, -1):
+            points = self._merge(points, cell_size(zoom, pixels))
+            self.levels[zoom] = points
+
+    @staticmethod
+    def _merge(points, size):
+        lat = points["lat"].to_numpy()
+        lon = points["lon"].to_numpy()
+        count = points["count"].to_numpy()
+        cells = [np.floor(lat / size).astype(np.int64), np.floor(lon / size).astype(np.int64)]
+
+        merged = points.assign(lat=lat * count, lon=lon * count).groupby(cells, sort=False).agg(
+            lat=("lat", "sum"),
+            lon=("lon", "sum"),
+            count=("count", "sum"),
+            mag_max=("mag_max", "max"),
+            mag_sum=("mag_sum", "sum"),
+        )
+        merged["lat"] /= merged["count"]
+        merged["lon"] /= merged["count"]
+        return merged.reset_index(drop=True)
+
+    def query(self, zoom, bounds=None):
+        """Get the clusters and single events to draw at a zoom level
+
+        Args:
+            zoom (int): map zoom level
+            bounds (list[float], optional): [west, south, east, north] of the viewport. Defaults to None (everything).
+
+        Returns:
+            pd dataframe: lat, lon, count, mag_max and mag_sum of every cluster (count 1 for single events)
+        """
+        points = self.levels[min(max(int(zoom), 0), self.max_zoom + 1)]
+        if bounds is None:
+            return points
+
+        west, south, east, north = bounds
+        lat = points["lat"].to_numpy()
+        lon = points["lon"].to_numpy()
+        return points[(lon >= west) & (lon <= east) & (lat >= south) & (lat <= north)]
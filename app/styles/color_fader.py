@@ -1,5 +1,10 @@
-from skimage.color import lab2rgb
-from numpy import asarray, linspace, cos, sin, vstack, ones, radians
+from functools import lru_cache
+
+from numpy import asarray, linspace, cos, sin, stack, ones, radians
+
+
+# Number of palettes kept per worker, they only depend on the arguments
+PALETTE_CACHE_SIZE = 64
 
 
 def lch_to_lab(L, c, h):
@@ -42,6 +47,18 @@ def lab_color_scale(lutsize=256, hue=0, chroma=50, rot=1/4, l=None):
     RGBs : list
         The resulting colormap object
     """
+    if l is not None and hasattr(l, "__len__"):
+        # Lists and arrays aren't hashable
+        l = tuple(asarray(l).tolist())
+
+    return list(_palette(lutsize, hue, chroma, rot, l))
+
+
+@lru_cache(maxsize=PALETTE_CACHE_SIZE)
+def _palette(lutsize, hue, chroma, rot, l):
+    # skimage is slow to import and only needed the first time a palette is built
+    from skimage.color import lab2rgb
+
     hue = linspace(hue, hue + rot * 360, lutsize)
 
     if l is None:
@@ -50,7 +67,7 @@ def lab_color_scale(lutsize=256, hue=0, chroma=50, rot=1/4, l=None):
         if len(l) == 2:
             L = linspace(l[0], l[1], lutsize)
         elif len(l) == 1:
-            L = l * ones(lutsize)
+            L = l[0] * ones(lutsize)
         elif len(l) == lutsize:
             L = asarray(l)
         else:
@@ -60,11 +77,11 @@ def lab_color_scale(lutsize=256, hue=0, chroma=50, rot=1/4, l=None):
 
     L, a, b = lch_to_lab(L, chroma, hue)
 
-    Lab = vstack([L, a, b])
-
-    RGBs = [tuple(map(lambda x: x*255, lab2rgb(i))) for i in Lab.T]
+    # Convert the whole colormap at once, lab2rgb works on (..., 3) images
+    Lab = stack([L, a, b], axis=-1)
+    RGBs = lab2rgb(Lab[None, :, :])[0] * 255
 
-    return [f"rgb({r}, {g}, {b})" for r, g, b in RGBs]
+    return tuple(f"rgb({r}, {g}, {b})" for r, g, b in RGBs.tolist())
 
 
 def custom_discrete_sequence(n):
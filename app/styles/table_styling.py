@@ -1,61 +1,71 @@
-from dash import html
+import numpy as np
 from dash.dash_table.Format import Format, Scheme, Symbol
 
 from .color_fader import custom_discrete_sequence
+from ..data import lru
 
 
-def highlight_max_value(df):
+# Conditional styles of the recent tables, per dataset version
+_styles = lru.LRUCache(32)
+
+
+def _cached_styles(name, key, build):
+    """Build a list of styles once per key, key None disables the cache"""
+    if key is None:
+        return build()
+
+    styles = _styles.get((name, key))
+    if styles is None:
+        styles = build()
+        _styles.set((name, key), styles)
+    return list(styles)
+
+
+def _numeric_columns(df):
+    numeric_columns = df.select_dtypes('number')
+    if 'id' in numeric_columns:
+        numeric_columns = numeric_columns.drop(['id'], axis=1)
+    return numeric_columns
+
+
+def _extreme_value_styles(values, backgroundColor):
+    return [
+        {
+            'if': {
+                'filter_query': '{{{col}}} = {value}'.format(col=col, value=value),
+                'column_id': col
+            },
+            'backgroundColor': backgroundColor,
+            'color': 'white'
+        }
+        for col, value in values.items()
+    ]
+
+
+def highlight_max_value(df, key=None):
     """
     Return a list of conditional styles highlighting the max value in each column of a dataframe in a datatable.
 
     :param pandas.Dataframe df: A pandas dataframe
+    :param key: Hashable key of df (e.g. dataset version and table), the styles are cached under it
     :return list: List of conditional styles
     """
-    if 'id' in df:
-        numeric_columns = df.select_dtypes('number').drop(['id'], axis=1)
-    else:
-        numeric_columns = df.select_dtypes('number')
-    max_across_numeric_columns = numeric_columns.max()
-    styles = []
-    for col in max_across_numeric_columns.keys():
-        styles.append({
-            'if': {
-                'filter_query': '{{{col}}} = {value}'.format(
-                    col=col, value=max_across_numeric_columns[col]
-                ),
-                'column_id': col
-            },
-            'backgroundColor': '#ff0000',
-            'color': 'white'
-        })
-    return styles
+    return _cached_styles(
+        "max", key, lambda: _extreme_value_styles(_numeric_columns(df).max(), '#ff0000')
+    )
 
 
-def highlight_min_value(df):
+def highlight_min_value(df, key=None):
     """
     Return a list of conditional styles highlighting the min value in each column of a dataframe in a datatable.
 
     :param pandas.Dataframe df: A pandas dataframe
+    :param key: Hashable key of df (e.g. dataset version and table), the styles are cached under it
     :return list: List of datatable conditional styles
     """
-    if 'id' in df:
-        numeric_columns = df.select_dtypes('number').drop(['id'], axis=1)
-    else:
-        numeric_columns = df.select_dtypes('number')
-    min_across_numeric_columns = numeric_columns.min()
-    styles = []
-    for col in min_across_numeric_columns.keys():
-        styles.append({
-            'if': {
-                'filter_query': '{{{col}}} = {value}'.format(
-                    col=col, value=min_across_numeric_columns[col]
-                ),
-                'column_id': col
-            },
-            'backgroundColor': '#00910f',
-            'color': 'white'
-        })
-    return styles
+    return _cached_styles(
+        "min", key, lambda: _extreme_value_styles(_numeric_columns(df).min(), '#00910f')
+    )
 
 
 def every_other_rows(df):
@@ -71,65 +81,59 @@ def every_other_rows(df):
     }
 
 
-def discrete_background_color_bins(df, n_bins=5, columns='all'):
-    """
-    Generate a color gradient for a column in a datatable.
-
-    :param pandas.Dataframe df: A pandas dataframe
-    :param int n_bins: Number of different colors
-    :param list columns: Columns to apply the formatting to
-    :return list: List of datatable conditional styles
-    """
-    bounds = [i * (1.0 / n_bins) for i in range(n_bins + 1)]
+def _background_color_bins(df, n_bins, columns):
     if columns == 'all':
-        if 'id' in df:
-            df_numeric_columns = df.select_dtypes('number').drop(['id'], axis=1)
-        else:
-            df_numeric_columns = df.select_dtypes('number')
+        df_numeric_columns = _numeric_columns(df)
     else:
         df_numeric_columns = df[columns]
-    df_max = df_numeric_columns.max().max()
-    df_min = df_numeric_columns.min().min()
-    ranges = [
-        ((df_max - df_min) * i) + df_min
-        for i in bounds
-    ]
+
+    # Extrema of all the columns in one pass
+    values = df_numeric_columns.to_numpy(dtype=float)
+    if not values.size:
+        return []
+    df_max = np.nanmax(values)
+    df_min = np.nanmin(values)
+    ranges = [((df_max - df_min) * (i * (1.0 / n_bins))) + df_min for i in range(n_bins + 1)]
+    colors = custom_discrete_sequence(n_bins)
+
     styles = []
-    legend = []
-    for i in range(1, len(bounds)):
+    for i in range(1, n_bins + 1):
         min_bound = ranges[i - 1]
         max_bound = ranges[i]
-        backgroundColor = custom_discrete_sequence(n_bins)[i - 1]
-        color = 'white' if i > len(bounds) / 2. else 'inherit'
+        color = 'white' if i > (n_bins + 1) / 2. else 'inherit'
+        query = '{{{column}}} >= {min_bound}' + (' && {{{column}}} < {max_bound}' if i < n_bins else '')
 
-        for column in df_numeric_columns:
-            styles.append({
+        styles.extend(
+            {
                 'if': {
-                    'filter_query': (
-                        '{{{column}}} >= {min_bound}' +
-                        (' && {{{column}}} < {max_bound}' if (i < len(bounds) - 1) else '')
-                    ).format(column=column, min_bound=min_bound, max_bound=max_bound),
+                    'filter_query': query.format(column=column, min_bound=min_bound, max_bound=max_bound),
                     'column_id': column
                 },
-                'backgroundColor': backgroundColor,
+                'backgroundColor': colors[i - 1],
                 'color': color
-            })
-        legend.append(
-            html.Div(style={'display': 'inline-block', 'width': '60px'}, children=[
-                html.Div(
-                    style={
-                        'backgroundColor': backgroundColor,
-                        'borderLeft': '1px rgb(50, 50, 50) solid',
-                        'height': '10px'
-                    }
-                ),
-                html.Small(round(min_bound, 2), style={'paddingLeft': '2px'})
-            ])
+            }
+            for column in df_numeric_columns
         )
 
     return styles
 
 
+def discrete_background_color_bins(df, n_bins=5, columns='all', key=None):
+    """
+    Generate a color gradient for a column in a datatable.
+
+    :param pandas.Dataframe df: A pandas dataframe
+    :param int n_bins: Number of different colors
+    :param list columns: Columns to apply the formatting to
+    :param key: Hashable key of df (e.g. dataset version and table), the styles are cached under it
+    :return list: List of datatable conditional styles
+    """
+    columns_key = columns if columns == 'all' else tuple(columns)
+    return _cached_styles(
+        ("bins", n_bins, columns_key), key, lambda: _background_color_bins(df, n_bins, columns)
+    )
+
+
 class ColumnFormat(object):
 
     def __init__(self, col_id, col_name=""):
@@ -0,0 +1,20 @@
+import os
+
+
+# Point traces with more points than this are drawn with WebGL instead of SVG
+WEBGL_THRESHOLD = int(os.environ.get("WEBGL_THRESHOLD", 1000))
+
+
+def render_mode(df):
+    """render_mode of the plotly express scatter and line figures of a dataframe
+
+    SVG traces freeze the browser with tens of thousands of points, WebGL ones don't but lose
+    a bit of rendering quality, so they're only used for large figures.
+
+    Args:
+        df (pd dataframe): data of the figure
+
+    Returns:
+        str: "webgl" above WEBGL_THRESHOLD points, "svg" otherwise
+    """
+    return "webgl" if len(df) > WEBGL_THRESHOLD else "svg"
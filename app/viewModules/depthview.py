@@ -1,8 +1,12 @@
 from dash import html, dcc
 
+from ..data import clientside
+
 depthview_layout = html.Div(children=[
     dcc.Graph(
         id='scatter-depth',
         className="eq-graph"
-    )
+    ),
+    # Events of the selected dates, only loaded by the views filtering them in the browser
+    *([dcc.Store(id="events-store")] if clientside.ENABLED else []),
 ])
\ No newline at end of file
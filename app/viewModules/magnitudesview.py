@@ -1,5 +1,7 @@
 from dash import html, dcc
 
+from ..data import clientside
+
 magnitudeview_layout = html.Div(children=[
     dcc.Graph(
         id='histogram-range-mag',
@@ -12,5 +14,7 @@ magnitudeview_layout = html.Div(children=[
     dcc.Graph(
         id='line-daily-earthquakes',
         className="eq-graph"
-    )
+    ),
+    # Events of the selected dates, only loaded by the views filtering them in the browser
+    *([dcc.Store(id="events-store")] if clientside.ENABLED else []),
 ])
\ No newline at end of file
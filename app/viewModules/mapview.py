@@ -1,5 +1,6 @@
 from dash import html, dcc
 from ..components.map_options import map_option, map_overlay, map_type
+from ..data.spatial import DEFAULT_ZOOM
 
 def mapview_layout():
     return html.Div(children=[
@@ -16,4 +17,5 @@ def mapview_layout():
         id='map-viz',
         className="eq-map"
     ),
+    dcc.Store(id="map-viewport", data={"zoom": DEFAULT_ZOOM, "bounds": None}),
 ])
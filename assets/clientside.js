@@ -0,0 +1,101 @@
+// Graphs rebuilt in the browser from the events-store when CLIENTSIDE_FILTERING is enabled,
+// the server only sends the events again when the dates change.
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    events: {
+        // Positions of the events within the magnitude and depth ranges (bounds included)
+        filter: function(columns, magnitude_range, depth_range) {
+            var mag = columns.mag;
+            var depth = columns.depth;
+            var rows = [];
+            for (var i = 0; i < mag.length; i++) {
+                if (magnitude_range && (mag[i] < magnitude_range[0] || mag[i] > magnitude_range[1])) {
+                    continue;
+                }
+                if (depth_range && (depth[i] < depth_range[0] || depth[i] > depth_range[1])) {
+                    continue;
+                }
+                rows.push(i);
+            }
+            return rows;
+        },
+
+        scatter_depth: function(store, magnitude_range, depth_range) {
+            if (!store) {
+                return window.dash_clientside.no_update;
+            }
+            var columns = store.columns;
+            var rows = window.dash_clientside.events.filter(columns, magnitude_range, depth_range);
+
+            var x = [], y = [], color = [], size = [];
+            var max_size = 0;
+            rows.forEach(function(i) {
+                var s = columns.mag[i] * columns.mag[i];
+                x.push(columns.time[i]);
+                y.push(-columns.depth[i]);
+                color.push(columns.mag[i]);
+                size.push(s);
+                max_size = Math.max(max_size, s);
+            });
+
+            // Same marker sizing as plotly express with size_max=15
+            var size_max = 15;
+            return {
+                data: [{
+                    type: x.length > store.webgl_threshold ? "scattergl" : "scatter",
+                    mode: "markers",
+                    x: x,
+                    y: y,
+                    name: "",
+                    showlegend: false,
+                    hovertemplate: "time=%{x}<br>y=%{y}<br>size=%{marker.size}<br>mag=%{marker.color}<extra></extra>",
+                    marker: {
+                        color: color,
+                        coloraxis: "coloraxis",
+                        size: size,
+                        sizemode: "area",
+                        sizeref: max_size ? max_size / (size_max * size_max) : 1,
+                        symbol: "circle",
+                    },
+                }],
+                layout: store.layouts["scatter-depth"],
+            };
+        },
+
+        line_daily: function(store, magnitude_range, depth_range) {
+            if (!store) {
+                return window.dash_clientside.no_update;
+            }
+            var columns = store.columns;
+            var rows = window.dash_clientside.events.filter(columns, magnitude_range, depth_range);
+
+            // Events are sorted by time, days come out in order
+            var days = [], counts = [];
+            rows.forEach(function(i) {
+                var day = columns.time[i].slice(0, 10);
+                if (days.length && days[days.length - 1] === day) {
+                    counts[counts.length - 1] += 1;
+                } else {
+                    days.push(day);
+                    counts.push(1);
+                }
+            });
+
+            return {
+                data: [{
+                    type: "scatter",
+                    mode: "lines+markers+text",
+                    x: days,
+                    y: counts,
+                    text: counts,
+                    textposition: "bottom right",
+                    name: "",
+                    showlegend: false,
+                    hovertemplate: "date=%{x}<br>earthquakes=%{text}<extra></extra>",
+                    line: {color: "#636efa", dash: "solid"},
+                    marker: {symbol: "circle"},
+                }],
+                layout: store.layouts["line-daily-earthquakes"],
+            };
+        },
+    },
+});
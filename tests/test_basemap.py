@@ -0,0 +1,22 @@
+import numpy as np
+from skimage import io
+
+from app.data import basemap
+
+
+def test_shape_from_png_header():
+    assert basemap._shape() == io.imread(basemap.MAP_FILE).T.shape[1:]
+
+
+def test_scaling_does_not_load_the_image(monkeypatch):
+    monkeypatch.setattr(basemap, "_basemap", {})
+
+    lat_scaled, lon_scaled = basemap.scale_coordinates(
+        np.array([basemap.LAT_MIN, basemap.LAT_MAX]) - basemap.LAT_SHIFT,
+        np.array([basemap.LON_MIN, basemap.LON_MAX]) - basemap.LON_SHIFT,
+    )
+
+    r, c = basemap._shape()
+    np.testing.assert_allclose(lat_scaled, [0, c])
+    np.testing.assert_allclose(lon_scaled, [0, r])
+    assert basemap._basemap == {}
@@ -0,0 +1,73 @@
+import re
+
+import numpy as np
+import pytest
+from skimage.color import lab2rgb
+
+from app.styles import color_fader
+
+
+def _reference(lutsize=256, hue=0, chroma=50, rot=1/4, l=None):
+    """lab_color_scale as it was before the palettes were cached: one lab2rgb call per color"""
+    hue = np.linspace(hue, hue + rot * 360, lutsize)
+
+    if l is None:
+        L = np.linspace(0, 100, lutsize)
+    elif hasattr(l, "__len__"):
+        if len(l) == 2:
+            L = np.linspace(l[0], l[1], lutsize)
+        elif len(l) == 1:
+            L = l * np.ones(lutsize)
+        elif len(l) == lutsize:
+            L = np.asarray(l)
+        else:
+            raise ValueError('lightness argument not understood')
+    else:
+        L = l * np.ones(lutsize)
+
+    L, a, b = color_fader.lch_to_lab(L, chroma, hue)
+    Lab = np.vstack([L, a, b])
+    RGBs = [tuple(map(lambda x: x*255, lab2rgb(i))) for i in Lab.T]
+
+    return [f"rgb({r}, {g}, {b})" for r, g, b in RGBs]
+
+
+def _components(colors):
+    return np.array([[float(v) for v in re.findall(r"[-\d.e]+", color)] for color in colors])
+
+
+@pytest.mark.parametrize("kwargs", [
+    {},
+    {"lutsize": 1},
+    {"lutsize": 7, "hue": 306, "rot": 140/360, "chroma": 80, "l": [16, 93]},
+    {"lutsize": 5, "l": 60},
+    {"lutsize": 5, "l": [60]},
+    {"lutsize": 3, "l": np.array([20, 50, 80]), "rot": -1},
+])
+def test_matches_per_color_conversion(kwargs):
+    colors = color_fader.lab_color_scale(**kwargs)
+    expected = _reference(**kwargs)
+
+    assert len(colors) == len(expected)
+    # The vectorized conversion may differ in the last digit
+    np.testing.assert_allclose(_components(colors), _components(expected), rtol=1e-12, atol=1e-9)
+
+
+def test_custom_discrete_sequence():
+    for n in range(1, 12):
+        np.testing.assert_allclose(
+            _components(color_fader.custom_discrete_sequence(n)),
+            _components(_reference(lutsize=n, hue=306, rot=140/360, chroma=80, l=[16, 93])),
+            rtol=1e-12, atol=1e-9,
+        )
+
+
+def test_cached_palette_is_not_shared():
+    colors = color_fader.custom_discrete_sequence(5)
+    colors.append("rgb(0, 0, 0)")
+    assert len(color_fader.custom_discrete_sequence(5)) == 5
+
+
+def test_lightness_not_understood():
+    with pytest.raises(ValueError):
+        color_fader.lab_color_scale(lutsize=5, l=[10, 20, 30])
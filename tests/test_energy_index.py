@@ -0,0 +1,95 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.data import energy_index
+
+
+RANGES = [
+    (None, None),
+    ([0, 10], [-5, 50]),
+    ([1.5, 3], None),
+    ([2, 2], [10, 20]),
+    (None, [0, 5]),
+    ([3.5, 4.5], [5, 15]),
+]
+
+
+def _events(n, seed, start="2021-09-11"):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        "unid": [f"{seed}_{i}" for i in range(n)],
+        # Rounded like the catalog, so plenty of events on the band edges
+        "mag": rng.uniform(0, 5, n).round(1),
+        "depth": rng.integers(0, 40, n),
+        "time": pd.Timestamp(start) + pd.to_timedelta(rng.integers(0, 30 * 24 * 3600, n), unit="s"),
+    })
+    df["energy"] = 10 ** (1.5 * df["mag"] + 4.8)
+    return df.sort_values("time", ignore_index=True)
+
+
+def _assert_matches(index, df):
+    times = np.sort(np.r_[df["time"].to_numpy()[::7], np.datetime64("2021-09-01"), np.datetime64("2021-12-01")])
+    for magnitude_range, depth_range in RANGES:
+        mask = pd.Series(True, index=df.index)
+        if magnitude_range is not None:
+            mask &= df["mag"].between(*magnitude_range)
+        if depth_range is not None:
+            mask &= df["depth"].between(*depth_range)
+
+        for side in ["right", "left"]:
+            expected = [
+                df.loc[mask & (df["time"] <= t if side == "right" else df["time"] < t), "energy"].sum()
+                for t in times
+            ]
+            np.testing.assert_allclose(index.cumulative(times, magnitude_range, depth_range, side=side), expected, rtol=1e-9)
+
+
+@pytest.fixture
+def df():
+    return _events(500, seed=1)
+
+
+def test_full_build(df):
+    index = energy_index.EnergyIndex()
+    index.update(df, "v1")
+
+    assert index.version == "v1"
+    _assert_matches(index, df)
+
+
+def test_update_with_revised_and_new_rows(df):
+    index = energy_index.EnergyIndex()
+    index.update(df, "v1")
+
+    revised = df.copy()
+    # Revised magnitudes and depths moving events to other bands, and a revised time
+    revised.loc[::20, "mag"] = (revised.loc[::20, "mag"] + 0.7).round(1)
+    revised.loc[5::30, "depth"] = revised.loc[5::30, "depth"] + 12
+    revised.loc[3, "time"] = revised.loc[3, "time"] + pd.Timedelta(days=2)
+    revised["energy"] = 10 ** (1.5 * revised["mag"] + 4.8)
+    # Deleted events, new events after the last one and in the middle of the range
+    revised = revised.drop(index=range(100, 110))
+    new = pd.concat([_events(40, seed=2, start="2021-10-11"), _events(10, seed=3)])
+    revised = pd.concat([revised, new]).sort_values("time", ignore_index=True)
+
+    index.update(revised, "v2")
+
+    assert index.version == "v2"
+    _assert_matches(index, revised)
+
+
+def test_only_new_rows_are_appended(df):
+    index = energy_index.EnergyIndex()
+    index.update(df.iloc[:400], "v1")
+    index.update(df, "v2")
+
+    _assert_matches(index, df)
+
+
+def test_range_off_the_slider_steps(df):
+    index = energy_index.EnergyIndex()
+    index.update(df, "v1")
+
+    assert index.cumulative(df["time"].to_numpy(), [1.2, 3]) is None
+    assert index.cumulative(df["time"].to_numpy(), None, [0, 7]) is None
@@ -0,0 +1,19 @@
+import pytest
+
+from app import app as dash_app
+from app.data import database
+from app.data.db_helper import pool
+
+from test_process_data import _rows
+
+
+@pytest.mark.parametrize("reachable, status", [(True, 200), (False, 503)])
+def test_health_route(monkeypatch, reachable, status):
+    # Dash builds the layout once before the first request, with the whole dataset
+    monkeypatch.setattr(dash_app, "get_unfiltered_df", lambda: database.process_data(_rows()))
+    monkeypatch.setattr(pool, "healthcheck", lambda: reachable)
+
+    response = dash_app.server.test_client().get("/health")
+
+    assert response.status_code == status
+    assert response.get_json()["status"] == ("ok" if reachable else "database unreachable")
@@ -0,0 +1,64 @@
+import math
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.data import calculations
+
+
+def _reference(data, threshold):
+    """Largest triangle three buckets as in the reference implementation, one point at a time"""
+    every = (len(data) - 2) / (threshold - 2)
+    a = 0
+    sampled = [0]
+
+    for i in range(threshold - 2):
+        avg_range_start = int(math.floor((i + 1) * every) + 1)
+        avg_range_end = min(int(math.floor((i + 2) * every) + 1), len(data))
+        avg_x = sum(x for x, _ in data[avg_range_start:avg_range_end]) / (avg_range_end - avg_range_start)
+        avg_y = sum(y for _, y in data[avg_range_start:avg_range_end]) / (avg_range_end - avg_range_start)
+
+        point_ax, point_ay = data[a]
+        max_area = -1
+        for j in range(int(math.floor(i * every) + 1), int(math.floor((i + 1) * every) + 1)):
+            area = math.fabs((point_ax - avg_x) * (data[j][1] - point_ay) - (point_ax - data[j][0]) * (avg_y - point_ay)) * 0.5
+            if area > max_area:
+                max_area = area
+                next_a = j
+        sampled.append(next_a)
+        a = next_a
+
+    sampled.append(len(data) - 1)
+    return sampled
+
+
+@pytest.mark.parametrize("n, n_out", [(10, 3), (100, 10), (1000, 37), (1000, 999), (5000, 500)])
+def test_matches_reference(n, n_out):
+    rng = np.random.default_rng(n + n_out)
+    x = np.sort(rng.uniform(0, 100, n))
+    y = np.cumsum(rng.normal(size=n))
+
+    kept = calculations.lttb(x, y, n_out)
+
+    assert kept.tolist() == _reference(list(zip(x.tolist(), y.tolist())), n_out)
+    assert kept[0] == 0 and kept[-1] == n - 1
+    assert len(kept) == n_out
+    assert (np.diff(kept) > 0).all()
+
+
+def test_datetime_x():
+    rng = np.random.default_rng(0)
+    x = pd.date_range("2021-09-11", periods=2000, freq="7min").to_numpy()
+    y = np.cumsum(rng.exponential(size=2000))
+
+    kept = calculations.lttb(x, y, 100)
+
+    seconds = ((x - x[0]) / np.timedelta64(1, "s")).tolist()
+    assert kept.tolist() == _reference(list(zip(seconds, y.tolist())), 100)
+
+
+@pytest.mark.parametrize("n_out", [50, 51, 1000, 2, 0])
+def test_passes_short_lines_through(n_out):
+    x = np.arange(50)
+    assert calculations.lttb(x, np.sin(x), n_out).tolist() == list(range(50))
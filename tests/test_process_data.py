@@ -0,0 +1,167 @@
+from datetime import datetime, timedelta, timezone
+import warnings
+
+import pandas as pd
+import pytest
+
+from app.data import calculations, database
+
+
+EXPECTED_COLUMNS = [
+    "lastupdate", "magtype", "evtype", "lon", "lat", "depth", "unid", "mag", "time", "source_id",
+    "source_catalog", "flynn_region", "date", "week", "mag_range", "mag_mean", "depth_mean",
+    "daily_eq", "energy", "lat_scaled", "lon_scaled",
+]
+
+EXPECTED_DTYPES = {
+    "lastupdate": "datetime64[ns]",
+    "time": "datetime64[ns]",
+    "date": "datetime64[ns]",
+    "magtype": "category",
+    "evtype": "category",
+    "source_catalog": "category",
+    "flynn_region": "category",
+    "mag_range": "category",
+    "lon": "float64",
+    "lat": "float64",
+    "mag": "float64",
+    "depth": "int16",
+    "week": "uint8",
+    "mag_mean": "float64",
+    "depth_mean": "float32",
+    "daily_eq": "int32",
+    "energy": "float64",
+    "lat_scaled": "float32",
+    "lon_scaled": "float32",
+    "unid": "object",
+    "source_id": "object",
+}
+
+
+def _rows():
+    # Out of time order, over a week boundary (Sunday 2021-10-03 -> Monday 2021-10-04), with
+    # magnitudes on the bin edges. Timestamps are timezone aware UTC, like the database loaders return them
+    events = [
+        (datetime(2021, 10, 4, 10, 0, tzinfo=timezone.utc), 2.0, 12.0),
+        (datetime(2021, 10, 3, 22, 30, tzinfo=timezone.utc), 0.8, 35.0),
+        (datetime(2021, 10, 3, 0, 15, tzinfo=timezone.utc), 5.0, 8.0),
+        (datetime(2021, 10, 4, 23, 59, tzinfo=timezone.utc), 3.1, 10.0),
+        (datetime(2021, 10, 3, 9, 5, tzinfo=timezone.utc), 2.01, 11.0),
+        (datetime(2021, 10, 5, 0, 1, tzinfo=timezone.utc), 5.3, 40.0),
+        (datetime(2021, 10, 4, 3, 45, tzinfo=timezone.utc), 4.0, 13.0),
+    ]
+    return [
+        {
+            "lastupdate": t + timedelta(minutes=5),
+            "magtype": "ml",
+            "evtype": "ke",
+            "lon": -17.85 + i / 100,
+            "lat": 28.57 + i / 100,
+            "depth": depth,
+            "unid": f"2021100{i}_000000{i}",
+            "mag": mag,
+            "time": t,
+            "source_id": str(1000 + i),
+            "source_catalog": "EMSC-RTS",
+            "flynn_region": "CANARY ISLANDS, SPAIN REGION",
+        }
+        for i, (t, mag, depth) in enumerate(events)
+    ]
+
+
+def _baseline(d):
+    """process_data as it was before it was vectorized (a78b11e), row by row apply, iterrows and merges"""
+    master_df = pd.DataFrame(d)
+
+    master_df["time"] = master_df["time"].apply(lambda x: x.replace(tzinfo=None))
+    master_df["lastupdate"] = master_df["lastupdate"].apply(lambda x: x.replace(tzinfo=None))
+
+    master_df["lastupdate"] = pd.to_datetime(master_df["lastupdate"])
+    master_df["time"] = pd.to_datetime(master_df["time"])
+    master_df["date"] = master_df["time"].dt.date
+
+    master_df["depth"] = master_df.depth.astype(int)
+
+    master_df["coordinate"] = master_df["lat"].astype(str) + ", " + master_df["lon"].astype(str)
+
+    master_df['week'] = master_df['time'].dt.isocalendar().week
+
+    m_bins = [
+        pd.Interval(left=0, right=2),
+        pd.Interval(left=2, right=3),
+        pd.Interval(left=3, right=4),
+        pd.Interval(left=4, right=5),
+        pd.Interval(left=5, right=float("inf"))
+    ]
+
+    magnitude_ranges = []
+    for index, row in master_df.iterrows():
+        for r in m_bins:
+            if row["mag"] in r:
+                magnitude_ranges.append(r)
+
+    master_df['mag_range'] = magnitude_ranges
+
+    master_df = pd.merge(master_df, master_df.groupby("date").mean().round(decimals=1)[["mag", "depth"]], on="date", suffixes=("", "_mean"), how="right")
+    master_df = pd.merge(master_df, master_df.groupby("date").size().reset_index(name='daily_eq'), how="left", on=["date"])
+
+    master_df["energy"] = master_df.mag.apply(lambda x: 10 ** (1.5 * x + 4.8))
+    master_df = pd.merge(master_df, master_df.groupby("date")["energy"].sum().reset_index(name='daily_energy'), how="left", on=["date"])
+
+    master_df = master_df.sort_values("time", ignore_index=True)
+    master_df["cumEnergy"] = master_df.energy.cumsum()
+
+    return master_df
+
+
+def _normalized(s):
+    """Compare values rather than storage: categoricals, dates, nullable and compact dtypes"""
+    if isinstance(s.dtype, pd.CategoricalDtype) or isinstance(s.dtype, pd.IntervalDtype):
+        return s.astype(object)
+    if s.name == "date":
+        return pd.to_datetime(s)
+    if pd.api.types.is_integer_dtype(s.dtype):
+        return s.astype("int64")
+    if pd.api.types.is_float_dtype(s.dtype):
+        return s.astype("float64")
+    return s
+
+
+@pytest.fixture(scope="module")
+def processed():
+    return database.process_data(_rows())
+
+
+@pytest.fixture(scope="module")
+def baseline():
+    with warnings.catch_warnings():
+        # The baseline averages every column per day, the non numeric ones are dropped
+        warnings.simplefilter("ignore", FutureWarning)
+        return _baseline(_rows())
+
+
+def test_columns_and_dtypes(processed):
+    assert list(processed.columns) == EXPECTED_COLUMNS
+    assert {col: str(dtype) for col, dtype in processed.dtypes.items()} == EXPECTED_DTYPES
+
+
+def test_magnitude_range_labels(processed):
+    assert [str(c) for c in processed["mag_range"].cat.categories] == ["(0, 2]", "(2, 3]", "(3, 4]", "(4, 5]", "(5, inf]"]
+
+
+def test_matches_baseline(processed, baseline):
+    # Columns computed where they're used now, and the basemap coordinates added since
+    assert set(baseline.columns) - set(processed.columns) == {"coordinate", "daily_energy", "cumEnergy"}
+    assert set(processed.columns) - set(baseline.columns) == {"lat_scaled", "lon_scaled"}
+
+    for col in baseline.columns.intersection(processed.columns):
+        # depth_mean is stored as float32
+        pd.testing.assert_series_equal(_normalized(processed[col]), _normalized(baseline[col]), rtol=1e-6)
+
+
+def test_moved_columns_match_baseline(processed, baseline):
+    assert calculations.format_coordinates(processed).tolist() == baseline["coordinate"].tolist()
+    pd.testing.assert_series_equal(
+        processed.groupby("date")["energy"].transform("sum"), baseline["daily_energy"], check_names=False
+    )
+    pd.testing.assert_series_equal(processed["energy"].cumsum(), baseline["cumEnergy"], check_names=False)
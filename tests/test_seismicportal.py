@@ -0,0 +1,125 @@
+import json
+import threading
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+from app.data import seismicportal
+
+
+T0 = datetime(2021, 9, 1, tzinfo=timezone.utc)
+# One event every 6 hours, the ones at midnight are on the border of two daily slices
+EVENTS = [
+    {"type": "Feature", "id": f"ev{i}", "properties": {"time": seismicportal._format_time(T0 + timedelta(hours=6 * i))}}
+    for i in range(40)
+]
+
+
+class StandIn(object):
+    """FDSN event service answering from EVENTS, failing the first requests with a 503"""
+
+    def __init__(self, failures=0):
+        self.failures = failures
+        self.requests = []
+        self.served = []
+        self.lock = threading.Lock()
+
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                query = {k: v[0] for k, v in parse_qs(urlparse(self.path).query).items()}
+                with stand_in.lock:
+                    stand_in.requests.append(query)
+                    fail = stand_in.failures > 0
+                    stand_in.failures -= 1
+                if fail:
+                    self.send_response(503)
+                    self.end_headers()
+                    return
+
+                # Both ends of the time range are inclusive, like the real service
+                selected = [e for e in EVENTS if query["start"] <= e["properties"]["time"] <= query["end"]]
+                offset, limit = int(query["offset"]), int(query["limit"])
+                page = selected[offset - 1:offset - 1 + limit]
+                if not page:
+                    self.send_response(204)
+                    self.end_headers()
+                    return
+
+                with stand_in.lock:
+                    stand_in.served.extend(e["id"] for e in page)
+                body = json.dumps(page[0] if len(page) == 1 else {"type": "FeatureCollection", "features": page}).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_port}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def stand_in():
+    server = StandIn()
+    yield server
+    server.close()
+
+
+def _client(url, **kwargs):
+    return seismicportal.SeismicPortal(url, rate_limit=0, retry_backoff=0, **kwargs)
+
+
+def test_pages_through_every_slice(stand_in):
+    with _client(stand_in.url, concurrency=2) as client:
+        events = client.download_earthquakes(T0, T0 + timedelta(days=3), slice_length=timedelta(days=1), limit=2)
+
+    expected = [e["id"] for e in EVENTS if e["properties"]["time"] <= seismicportal._format_time(T0 + timedelta(days=3))]
+    assert sorted(e["id"] for e in events) == sorted(expected)
+    # 5 events per daily slice with both borders, 3 pages of 2
+    assert sorted(int(q["offset"]) for q in stand_in.requests) == [1, 1, 1, 3, 3, 3, 5, 5, 5]
+
+
+def test_events_on_slice_borders_are_yielded_once(stand_in):
+    with _client(stand_in.url) as client:
+        events = list(client.iter_events(T0, T0 + timedelta(days=3), slice_length=timedelta(days=1), limit=2))
+
+    ids = [e["id"] for e in events]
+    assert len(ids) == len(set(ids))
+    assert set(ids) == set(stand_in.served)
+    # The midnight events were served by the two slices around them
+    assert sorted(stand_in.served) == sorted(ids + ["ev4", "ev8"])
+
+
+def test_single_event_page(stand_in):
+    with _client(stand_in.url) as client:
+        assert client.query_page(T0, T0 + timedelta(hours=1)) == [EVENTS[0]]
+        assert client.query_page(T0 - timedelta(days=1), T0 - timedelta(hours=1)) == []
+
+
+def test_retries_unavailable_service(stand_in):
+    stand_in.failures = 2
+    with _client(stand_in.url, retries=2) as client:
+        events = client.download_earthquakes(T0, T0 + timedelta(days=1), slice_length=timedelta(days=1))
+
+    assert [e["id"] for e in events] == [e["id"] for e in EVENTS[:5]]
+    assert len(stand_in.requests) == 3
+
+
+def test_gives_up_after_the_retries(stand_in):
+    stand_in.failures = 3
+    with _client(stand_in.url, retries=2) as client:
+        with pytest.raises(ConnectionError):
+            client.download_earthquakes(T0, T0 + timedelta(days=1), slice_length=timedelta(days=1))
+    assert len(stand_in.requests) == 3
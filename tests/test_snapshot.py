@@ -0,0 +1,86 @@
+import pandas as pd
+import pytest
+
+from app.data import database, snapshot
+
+from test_process_data import _rows
+
+
+@pytest.fixture
+def shared(tmp_path, monkeypatch):
+    """Shared snapshot in a temporary directory, every request refreshes it"""
+    monkeypatch.setattr(snapshot, "SNAPSHOT_DIR", str(tmp_path))
+    monkeypatch.setattr(snapshot, "_attached", {"version": None, "df": None})
+    monkeypatch.setattr(database, "MASTER_DF_TIMEOUT", -1)
+
+    loaded = {}
+
+    def get_master_df():
+        df = database.process_data(loaded["rows"])
+        df.attrs["version"] = database._dataset_version(df)
+        return df
+
+    monkeypatch.setattr(database, "_get_master_df", get_master_df)
+    return loaded
+
+
+def test_unchanged_data_is_not_republished(shared):
+    shared["rows"] = _rows()
+    first = database._get_shared_master_df()
+    manifest = snapshot.read_manifest()
+
+    second = database._get_shared_master_df()
+    assert snapshot.read_manifest()["version"] == manifest["version"]
+    assert snapshot.read_manifest()["published_at"] > manifest["published_at"]
+    assert database.dataset_version(second) == database.dataset_version(first)
+
+
+def test_revision_within_the_same_minute_is_republished(shared):
+    shared["rows"] = _rows()
+    first = database._get_shared_master_df()
+    manifest = snapshot.read_manifest()
+
+    # Same number of rows and same newest last_update, only the magnitude of an event changes
+    rows = _rows()
+    rows[2]["mag"] = 4.6
+    shared["rows"] = rows
+    second = database._get_shared_master_df()
+
+    assert snapshot.read_manifest()["version"] == manifest["version"] + 1
+    assert database.dataset_version(second) != database.dataset_version(first)
+    assert second.loc[second["unid"] == rows[2]["unid"], "mag"].tolist() == [4.6]
+
+
+def test_incremental_refresh_resumes_from_the_snapshot(tmp_path, monkeypatch):
+    monkeypatch.setattr(snapshot, "SNAPSHOT_DIR", str(tmp_path))
+    monkeypatch.setattr(snapshot, "_attached", {"version": None, "df": None})
+    monkeypatch.setattr(database, "MASTER_DF_TIMEOUT", -1)
+    monkeypatch.setattr(database, "REFRESH_MODE", "incremental")
+    monkeypatch.setattr(database, "_resident", {"raw": None, "watermark": None, "full_loaded_at": 0.0})
+    monkeypatch.setattr(database.pool, "run", lambda fn: fn(None))
+
+    full_reloads = []
+    watermarks = []
+    revised = _rows()[2:3]
+    revised[0]["mag"] = 4.6
+
+    def copy_all_from_db(conn):
+        full_reloads.append(conn)
+        return pd.DataFrame(_rows())
+
+    def get_new_data_from_db(conn, watermark, columnar=False):
+        watermarks.append(watermark)
+        return pd.DataFrame(revised)
+
+    monkeypatch.setattr(database.tools, "copy_all_from_db", copy_all_from_db)
+    monkeypatch.setattr(database.tools, "get_new_data_from_db", get_new_data_from_db)
+
+    database._get_shared_master_df()
+    assert database._resident["raw"] is None
+
+    df = database._get_shared_master_df()
+    assert database._resident["raw"] is None
+    assert len(full_reloads) == 1
+    assert watermarks == [max(row["lastupdate"] for row in _rows())]
+    assert len(df) == len(_rows())
+    assert df.loc[df["unid"] == revised[0]["unid"], "mag"].tolist() == [4.6]
@@ -0,0 +1,88 @@
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.callbackModules import statistictables
+from app.data import calculations, database
+
+
+def _processed(n=400, seed=0):
+    rng = np.random.default_rng(seed)
+    start = datetime(2021, 9, 11, tzinfo=timezone.utc)
+    rows = []
+    for i in range(n):
+        t = start + timedelta(minutes=int(rng.integers(0, 60 * 24 * 60)))
+        rows.append({
+            "lastupdate": t + timedelta(minutes=5),
+            "magtype": "ml",
+            "evtype": "ke",
+            "lon": -17.85,
+            "lat": 28.57,
+            "depth": float(rng.integers(0, 40)),
+            "unid": f"event_{i}",
+            # Few distinct values so the sorted columns have ties
+            "mag": float(rng.integers(10, 50)) / 10,
+            "time": t,
+            "source_id": str(i),
+            "source_catalog": "EMSC-RTS",
+            "flynn_region": "CANARY ISLANDS, SPAIN REGION",
+        })
+    return database.process_data(rows)
+
+
+@pytest.fixture(scope="module")
+def stats():
+    return calculations.get_statistics(_processed(), "date")
+
+
+def _full_table_page(df, page_current, page_size, column_id, direction):
+    # The whole table sorted like the DataTable does it in the browser (stable), then sliced
+    ordered = df.sort_values(column_id, ascending=direction == "asc", kind="stable")
+    return ordered.iloc[page_current * page_size:(page_current + 1) * page_size]
+
+
+@pytest.mark.parametrize("column_id", ["date", "earthquakes", "mag_max", "depth_mean", "energy"])
+@pytest.mark.parametrize("direction", ["asc", "desc"])
+@pytest.mark.parametrize("page_size", [7, 25])
+def test_page_is_a_slice_of_the_sorted_table(stats, column_id, direction, page_size):
+    sort_by = [dict(column_id=column_id, direction=direction)]
+    pages = statistictables.page_count(stats, page_size)
+
+    for page_current in range(pages + 1):
+        page = statistictables.get_page(stats, page_current, page_size, sort_by, [])
+        pd.testing.assert_frame_equal(page, _full_table_page(stats, page_current, page_size, column_id, direction))
+
+    all_pages = [statistictables.get_page(stats, p, page_size, sort_by, []) for p in range(pages)]
+    pd.testing.assert_frame_equal(pd.concat(all_pages), _full_table_page(stats, 0, len(stats), column_id, direction))
+
+
+def test_default_sort(stats):
+    default_sort = [dict(column_id="date", direction="desc")]
+    pd.testing.assert_frame_equal(
+        statistictables.get_page(stats, 1, 10, [], default_sort),
+        _full_table_page(stats, 1, 10, "date", "desc"),
+    )
+    # Columns the table doesn't have are ignored
+    pd.testing.assert_frame_equal(
+        statistictables.get_page(stats, 0, 10, [dict(column_id="coordinate", direction="asc")], []),
+        stats.iloc[:10],
+    )
+
+
+def test_page_count():
+    assert statistictables.page_count(pd.DataFrame({"a": []}), 25) == 1
+    assert statistictables.page_count(pd.DataFrame({"a": range(25)}), 25) == 1
+    assert statistictables.page_count(pd.DataFrame({"a": range(26)}), 25) == 2
+
+
+def test_day_page_callback(stats, monkeypatch):
+    monkeypatch.setattr(database, "get_stats_df", lambda level: stats)
+
+    data, pages = statistictables.stats_day_page.__wrapped__(2, 10, [dict(column_id="mag_mean", direction="asc")])
+
+    expected = _full_table_page(stats, 2, 10, "mag_mean", "asc")
+    expected = expected.assign(date=expected["date"].dt.strftime("%Y-%m-%d"))
+    assert data == expected.to_dict("records")
+    assert pages == statistictables.page_count(stats, 10)
@@ -0,0 +1,108 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.styles import table_styling
+from app.styles.color_fader import custom_discrete_sequence
+
+
+def _baseline_numeric_columns(df):
+    if 'id' in df:
+        return df.select_dtypes('number').drop(['id'], axis=1)
+    return df.select_dtypes('number')
+
+
+def _baseline_extreme_values(values, backgroundColor):
+    return [
+        {
+            'if': {
+                'filter_query': '{{{col}}} = {value}'.format(col=col, value=values[col]),
+                'column_id': col
+            },
+            'backgroundColor': backgroundColor,
+            'color': 'white'
+        }
+        for col in values.keys()
+    ]
+
+
+def _baseline_bins(df, n_bins=5, columns='all'):
+    """discrete_background_color_bins as it was before the styles were cached, without the unused legend"""
+    bounds = [i * (1.0 / n_bins) for i in range(n_bins + 1)]
+    if columns == 'all':
+        df_numeric_columns = _baseline_numeric_columns(df)
+    else:
+        df_numeric_columns = df[columns]
+    df_max = df_numeric_columns.max().max()
+    df_min = df_numeric_columns.min().min()
+    ranges = [
+        ((df_max - df_min) * i) + df_min
+        for i in bounds
+    ]
+    colors = custom_discrete_sequence(n_bins)
+    styles = []
+    for i in range(1, len(bounds)):
+        min_bound = ranges[i - 1]
+        max_bound = ranges[i]
+        backgroundColor = colors[i - 1]
+        color = 'white' if i > len(bounds) / 2. else 'inherit'
+
+        for column in df_numeric_columns:
+            styles.append({
+                'if': {
+                    'filter_query': (
+                        '{{{column}}} >= {min_bound}' +
+                        (' && {{{column}}} < {max_bound}' if (i < len(bounds) - 1) else '')
+                    ).format(column=column, min_bound=min_bound, max_bound=max_bound),
+                    'column_id': column
+                },
+                'backgroundColor': backgroundColor,
+                'color': color
+            })
+
+    return styles
+
+
+@pytest.fixture
+def df():
+    rng = np.random.default_rng(0)
+    return pd.DataFrame({
+        "id": np.arange(30),
+        "date": pd.date_range("2021-09-11", periods=30),
+        "earthquakes": rng.integers(1, 300, 30),
+        "depth_mean": rng.uniform(0, 40, 30).astype("float32"),
+        "mag_max": rng.uniform(1, 5, 30).round(1),
+        "energy": 10 ** (1.5 * rng.uniform(1, 5, 30) + 4.8),
+        "coordinate": "28.57, -17.85",
+    })
+
+
+@pytest.mark.parametrize("n_bins", [1, 2, 5, 8])
+@pytest.mark.parametrize("columns", ['all', ["mag_max"], ["earthquakes", "depth_mean"]])
+def test_background_color_bins(df, n_bins, columns):
+    expected = _baseline_bins(df, n_bins, columns)
+    assert table_styling.discrete_background_color_bins(df, n_bins, columns) == expected
+    # Built once, then served from the cache
+    assert table_styling.discrete_background_color_bins(df, n_bins, columns, key=("test", n_bins)) == expected
+    assert table_styling.discrete_background_color_bins(df, n_bins, columns, key=("test", n_bins)) == expected
+
+
+def test_background_color_bins_without_id(df):
+    df = df.drop(columns="id")
+    assert table_styling.discrete_background_color_bins(df) == _baseline_bins(df)
+
+
+def test_highlight_extreme_values(df):
+    numeric = _baseline_numeric_columns(df)
+    assert table_styling.highlight_max_value(df) == _baseline_extreme_values(numeric.max(), '#ff0000')
+    assert table_styling.highlight_min_value(df) == _baseline_extreme_values(numeric.min(), '#00910f')
+
+    for _ in range(2):
+        assert table_styling.highlight_max_value(df, key="test") == _baseline_extreme_values(numeric.max(), '#ff0000')
+        assert table_styling.highlight_min_value(df, key="test") == _baseline_extreme_values(numeric.min(), '#00910f')
+
+
+def test_cached_styles_are_not_shared(df):
+    styles = table_styling.highlight_max_value(df, key="shared")
+    styles.append(table_styling.every_other_rows(df))
+    assert len(table_styling.highlight_max_value(df, key="shared")) == len(styles) - 1
@@ -0,0 +1,45 @@
+import numpy as np
+import plotly.express as px
+import pytest
+
+from app.data import calculations
+
+from test_statistictables import _processed
+
+
+@pytest.fixture(scope="module")
+def df():
+    return _processed(n=300, seed=1)
+
+
+def _px_treemap(df):
+    """The treemap as it was built before the hierarchy was computed from the cached leaves"""
+    df = df.groupby(['week', 'date', 'mag']).size().reset_index(name='count')
+    df["date"] = df["date"].dt.strftime("%Y-%m-%d")
+    fig = px.treemap(
+        df,
+        path=[px.Constant("La Palma"), 'week', 'date', 'mag'],
+        values='count',
+        color='count',
+    )
+    trace = fig.data[0]
+    return {
+        node_id: (label, parent, value, color)
+        for node_id, label, parent, value, color in zip(trace.ids, trace.labels, trace.parents, trace.values, trace.marker.colors)
+    }
+
+
+@pytest.mark.parametrize("magnitude_range", [None, [2.5, 4]])
+def test_nodes_match_px_treemap(df, magnitude_range):
+    if magnitude_range is not None:
+        df = calculations.filter_data(df, magnitude_range=magnitude_range)
+
+    nodes = calculations.treemap_nodes(calculations.treemap_leaves(df))
+    expected = _px_treemap(df)
+
+    assert nodes["id"].tolist()[0] == "La Palma"
+    assert sorted(nodes["id"]) == sorted(expected)
+    for node_id, label, parent, count, color in nodes[["id", "label", "parent", "count", "color"]].itertuples(index=False):
+        expected_label, expected_parent, expected_count, expected_color = expected[node_id]
+        assert (label, parent, count) == (expected_label, expected_parent, expected_count)
+        assert np.isclose(color, expected_color)